@@ -0,0 +1,499 @@
+# backend/carga.py
+#
+# Generador de carga para dimensionar el despliegue.
+#
+# Lanza clientes concurrentes con una mezcla configurable de peticiones
+# (/calcular, /login y el CRUD de /simulaciones) con usuarios y escenarios
+# sintéticos, y mide rendimiento y latencias (p50/p95/p99) por endpoint.
+#
+# Modos:
+#   - proceso: la app FastAPI se ejecuta dentro de este mismo proceso
+#     (TestClient) con una BD SQLite temporal.
+#   - uvicorn: arranca `uvicorn main:app --workers N` en local para cada
+#     número de workers del barrido, con una BD SQLite temporal
+#     (variable de entorno DHONDT_DB_PATH).
+#   - url: ataca a un servidor que ya está levantado.
+#
+# Ejemplos:
+#   python carga.py --modo proceso --duracion 10 --concurrencia 1,4,16
+#   python carga.py --modo uvicorn --workers 1,2,4 --concurrencia 8,32 --salida informe.json
+
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent
+
+# Mezcla de tráfico por defecto (pesos relativos)
+MEZCLA_POR_DEFECTO = {
+    "calcular": 60,
+    "login": 5,
+    "listar": 15,
+    "detalle": 10,
+    "crear": 5,
+    "actualizar": 3,
+    "eliminar": 2,
+}
+
+PASSWORD_SINTETICA = "Carga#2024"
+
+# Simulaciones que se crean para cada usuario antes de medir
+SIMULACIONES_INICIALES = 3
+
+
+# ============================================================
+# CLIENTES (en proceso o HTTP)
+# ============================================================
+
+class ClienteHTTP:
+    """Cliente mínimo con urllib para hablar con un servidor uvicorn."""
+
+    def __init__(self, url_base):
+        self.url_base = url_base.rstrip("/")
+
+    def peticion(self, metodo, ruta, cuerpo=None, params=None):
+        url = self.url_base + ruta
+        if params:
+            url += "?" + "&".join(f"{k}={v}" for k, v in params.items())
+        datos = json.dumps(cuerpo).encode("utf-8") if cuerpo is not None else None
+        req = urllib.request.Request(url, data=datos, method=metodo)
+        if datos is not None:
+            req.add_header("Content-Type", "application/json")
+        try:
+            with urllib.request.urlopen(req, timeout=30) as resp:
+                return resp.status, _leer_json(resp.read())
+        except urllib.error.HTTPError as e:
+            return e.code, _leer_json(e.read())
+
+
+class ClienteEnProceso:
+    """Cliente que llama a la app FastAPI dentro del propio proceso (TestClient)."""
+
+    def __init__(self, cliente_test):
+        self._cliente = cliente_test
+
+    def peticion(self, metodo, ruta, cuerpo=None, params=None):
+        resp = self._cliente.request(metodo, ruta, json=cuerpo, params=params)
+        return resp.status_code, _leer_json(resp.content)
+
+
+def _leer_json(contenido):
+    try:
+        return json.loads(contenido)
+    except ValueError:
+        return None
+
+
+# ============================================================
+# DATOS SINTÉTICOS
+# ============================================================
+
+def escenario_aleatorio(rng, partidos, escanos):
+    """Genera un cuerpo de /calcular con un número de partidos y escaños dentro de los rangos."""
+    num_partidos = rng.randint(*partidos)
+    return {
+        "num_escanos": rng.randint(*escanos),
+        "votos_blanco": rng.randint(0, 20000),
+        "votos_nulos": rng.randint(0, 10000),
+        "umbral_porcentaje": rng.choice([0.0, 3.0, 5.0]),
+        "partidos": [
+            {"nombre": f"P{i}", "votos": rng.randint(1000, 2000000), "color": None}
+            for i in range(num_partidos)
+        ],
+    }
+
+
+def preparar_usuarios(cliente, num_usuarios, prefijo, simulaciones=SIMULACIONES_INICIALES,
+                      partidos=(3, 12), escanos=(5, 350)):
+    """
+    Registra (o inicia sesión con) usuarios sintéticos, les crea `simulaciones`
+    simulaciones iniciales y devuelve una lista de diccionarios
+    {username, usuario_id, simulaciones}.
+
+    Si algo falla lanza RuntimeError: medir con usuarios que no existen solo
+    mediría el camino de error.
+    """
+    operaciones = Operaciones(cliente, random.Random(), partidos, escanos)
+    usuarios = []
+    for i in range(num_usuarios):
+        username = f"{prefijo}_{i}"
+        datos = {"username": username, "password": PASSWORD_SINTETICA}
+        estado, cuerpo = cliente.peticion("POST", "/register", datos)
+        if estado != 200:
+            estado, cuerpo = cliente.peticion("POST", "/login", datos)
+        if estado != 200 or not cuerpo or "usuario_id" not in cuerpo:
+            raise RuntimeError(
+                f"No se pudo registrar ni iniciar sesión con el usuario {username} "
+                f"(HTTP {estado}: {cuerpo})"
+            )
+
+        usuario = {"username": username, "usuario_id": cuerpo["usuario_id"], "simulaciones": []}
+        for _ in range(simulaciones):
+            estado = operaciones.crear(usuario)
+            if estado != 200:
+                raise RuntimeError(f"No se pudo crear una simulación para {username} (HTTP {estado})")
+        if len(usuario["simulaciones"]) < simulaciones:
+            raise RuntimeError(f"No se encontraron en el listado las simulaciones creadas para {username}")
+        usuarios.append(usuario)
+    return usuarios
+
+
+# ============================================================
+# EJECUCIÓN DE UNA CARGA
+# ============================================================
+
+class Operaciones:
+    """
+    Cada método hace una operación de la mezcla y devuelve el código HTTP de su
+    petición principal. Cada petición se mide por separado y se pasa a
+    `registrar(nombre, latencia, estado)`, así que la búsqueda que hace `crear`
+    después del POST cuenta como `listar` y no infla la latencia de `crear`.
+    """
+
+    # Operaciones que necesitan una simulación ya creada por el usuario
+    SOBRE_SIMULACION = ("detalle", "actualizar", "eliminar")
+
+    def __init__(self, cliente, rng, partidos, escanos, registrar=None):
+        self.cliente = cliente
+        self.rng = rng
+        self.partidos = partidos
+        self.escanos = escanos
+        self.registrar = registrar or (lambda nombre, latencia, estado: None)
+
+    def _peticion(self, nombre, metodo, ruta, cuerpo=None, params=None):
+        """Hace una petición, la mide y la registra con el nombre de su operación."""
+        inicio = time.perf_counter()
+        try:
+            estado, respuesta = self.cliente.peticion(metodo, ruta, cuerpo, params)
+        except Exception:
+            estado, respuesta = None, None
+        self.registrar(nombre, time.perf_counter() - inicio, estado)
+        return estado, respuesta
+
+    def calcular(self, usuario):
+        estado, _ = self._peticion(
+            "calcular", "POST", "/calcular", escenario_aleatorio(self.rng, self.partidos, self.escanos)
+        )
+        return estado
+
+    def login(self, usuario):
+        estado, _ = self._peticion(
+            "login", "POST", "/login",
+            {"username": usuario["username"], "password": PASSWORD_SINTETICA},
+        )
+        return estado
+
+    def listar(self, usuario):
+        estado, _ = self._peticion(
+            "listar", "GET", "/simulaciones", params={"usuario_id": usuario["usuario_id"]}
+        )
+        return estado
+
+    def detalle(self, usuario):
+        sim_id = self.rng.choice(usuario["simulaciones"])
+        estado, _ = self._peticion(
+            "detalle", "GET", f"/simulaciones/{sim_id}", params={"usuario_id": usuario["usuario_id"]}
+        )
+        return estado
+
+    def crear(self, usuario):
+        cuerpo = escenario_aleatorio(self.rng, self.partidos, self.escanos)
+        cuerpo["usuario_id"] = usuario["usuario_id"]
+        cuerpo["nombre"] = f"carga-{self.rng.getrandbits(48):x}"
+        estado, _ = self._peticion("crear", "POST", "/simulaciones", cuerpo)
+        if estado == 200:
+            # POST /simulaciones no devuelve el id: lo busco por nombre en el listado
+            _, lista = self._peticion(
+                "listar", "GET", "/simulaciones", params={"usuario_id": usuario["usuario_id"]}
+            )
+            for sim in lista or []:
+                if sim["nombre"] == cuerpo["nombre"]:
+                    usuario["simulaciones"].append(sim["id"])
+                    break
+        return estado
+
+    def actualizar(self, usuario):
+        sim_id = self.rng.choice(usuario["simulaciones"])
+        cuerpo = escenario_aleatorio(self.rng, self.partidos, self.escanos)
+        cuerpo["usuario_id"] = usuario["usuario_id"]
+        cuerpo["nombre"] = f"carga-{self.rng.getrandbits(48):x}"
+        estado, _ = self._peticion("actualizar", "PUT", f"/simulaciones/{sim_id}", cuerpo)
+        return estado
+
+    def eliminar(self, usuario):
+        simulaciones = usuario["simulaciones"]
+        sim_id = simulaciones.pop(self.rng.randrange(len(simulaciones)))
+        estado, _ = self._peticion(
+            "eliminar", "DELETE", f"/simulaciones/{sim_id}", params={"usuario_id": usuario["usuario_id"]}
+        )
+        return estado
+
+
+def percentil(valores_ordenados, p):
+    """Percentil p (0-100) por el método del rango más cercano."""
+    if not valores_ordenados:
+        return 0.0
+    indice = math.ceil(p / 100 * len(valores_ordenados)) - 1
+    return valores_ordenados[max(0, min(len(valores_ordenados) - 1, indice))]
+
+
+def ejecutar_carga(cliente, usuarios, mezcla, concurrencia, duracion,
+                   partidos=(3, 12), escanos=(5, 350), semilla=None):
+    """
+    Lanza `concurrencia` hilos durante `duracion` segundos. Cada hilo tiene sus
+    propios usuarios sintéticos (nunca comparte sus simulaciones con otro hilo)
+    y elige la operación según los pesos de la mezcla. Si sale una operación
+    sobre una simulación y el usuario ya no tiene ninguna, la cuento como
+    omitida en vez de cambiarla por otra.
+    Devuelve el informe con rendimiento y latencias por endpoint.
+    """
+    if len(usuarios) < concurrencia:
+        raise ValueError(
+            f"Hacen falta al menos {concurrencia} usuarios para {concurrencia} hilos "
+            f"(hay {len(usuarios)})"
+        )
+
+    nombres = list(mezcla)
+    pesos = [mezcla[n] for n in nombres]
+    medidas = {n: [] for n in MEZCLA_POR_DEFECTO}
+    errores = {n: 0 for n in MEZCLA_POR_DEFECTO}
+    omitidas = {n: 0 for n in MEZCLA_POR_DEFECTO}
+    cerrojo = threading.Lock()
+    fin = time.monotonic() + duracion
+
+    def registrar(nombre, latencia, estado):
+        with cerrojo:
+            medidas[nombre].append(latencia)
+            if estado != 200:
+                errores[nombre] += 1
+
+    def cliente_virtual(indice):
+        rng = random.Random(None if semilla is None else semilla + indice)
+        operaciones = Operaciones(cliente, rng, partidos, escanos, registrar)
+        # Cada hilo se queda con los usuarios indice, indice + concurrencia, ...
+        propios = usuarios[indice::concurrencia]
+        while time.monotonic() < fin:
+            nombre = rng.choices(nombres, pesos)[0]
+            usuario = rng.choice(propios)
+            if nombre in Operaciones.SOBRE_SIMULACION and not usuario["simulaciones"]:
+                with cerrojo:
+                    omitidas[nombre] += 1
+                continue
+            getattr(operaciones, nombre)(usuario)
+
+    hilos = [threading.Thread(target=cliente_virtual, args=(i,)) for i in range(concurrencia)]
+    inicio = time.monotonic()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    transcurrido = time.monotonic() - inicio
+
+    endpoints = {}
+    for nombre in medidas:
+        lat = sorted(medidas[nombre])
+        if not lat and not omitidas[nombre]:
+            continue
+        endpoints[nombre] = {
+            "peticiones": len(lat),
+            "errores": errores[nombre],
+            "omitidas": omitidas[nombre],
+            "rps": len(lat) / transcurrido,
+            "p50_ms": percentil(lat, 50) * 1000,
+            "p95_ms": percentil(lat, 95) * 1000,
+            "p99_ms": percentil(lat, 99) * 1000,
+        }
+
+    total = sum(len(m) for m in medidas.values())
+    return {
+        "concurrencia": concurrencia,
+        "duracion_s": transcurrido,
+        "peticiones": total,
+        "errores": sum(errores.values()),
+        "omitidas": sum(omitidas.values()),
+        "rps": total / transcurrido if transcurrido else 0.0,
+        "endpoints": endpoints,
+    }
+
+
+def imprimir_informe(informe, etiqueta=""):
+    """Muestra un informe en forma de tabla."""
+    print(f"\n== {etiqueta}concurrencia {informe['concurrencia']}: "
+          f"{informe['rps']:.1f} pet/s, {informe['peticiones']} peticiones, "
+          f"{informe['errores']} errores, {informe['omitidas']} omitidas ==")
+    print(f"{'endpoint':<12}{'pet':>8}{'err':>6}{'omit':>6}{'pet/s':>10}"
+          f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for nombre, d in informe["endpoints"].items():
+        print(f"{nombre:<12}{d['peticiones']:>8}{d['errores']:>6}{d['omitidas']:>6}{d['rps']:>10.1f}"
+              f"{d['p50_ms']:>10.2f}{d['p95_ms']:>10.2f}{d['p99_ms']:>10.2f}")
+
+
+# ============================================================
+# MODOS DE EJECUCIÓN
+# ============================================================
+
+def _barrido_concurrencia(cliente, args, etiqueta=""):
+    # Al menos un usuario por hilo, para que ningún hilo comparta usuarios con otro
+    num_usuarios = max([args.usuarios] + args.concurrencia)
+    usuarios = preparar_usuarios(cliente, num_usuarios, f"carga_{random.getrandbits(32):x}",
+                                 args.simulaciones, args.partidos, args.escanos)
+    informes = []
+    for concurrencia in args.concurrencia:
+        informe = ejecutar_carga(cliente, usuarios, args.mezcla, concurrencia, args.duracion,
+                                 args.partidos, args.escanos, args.semilla)
+        imprimir_informe(informe, etiqueta)
+        informes.append(informe)
+    return informes
+
+
+def modo_proceso(args):
+    """Carga contra la app dentro del proceso, con una BD SQLite temporal."""
+    sys.path.insert(0, str(BACKEND_DIR))
+    import db
+    from fastapi.testclient import TestClient
+    from main import app
+
+    # La BD temporal se borra al terminar; antes se cierra la app (y sus trabajos)
+    ruta_original = db.DB_PATH
+    with tempfile.TemporaryDirectory() as directorio:
+        db.DB_PATH = Path(directorio) / "carga.sqlite3"
+        try:
+            with TestClient(app) as cliente_test:
+                informes = _barrido_concurrencia(ClienteEnProceso(cliente_test), args, "en proceso, ")
+        finally:
+            db.DB_PATH = ruta_original
+    return [{"modo": "proceso", "workers": None, "informes": informes}]
+
+
+def _esperar_servidor(cliente, proceso, timeout=30):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError("uvicorn terminó antes de estar listo")
+        try:
+            estado, _ = cliente.peticion("GET", "/openapi.json")
+            if estado == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("uvicorn no respondió a tiempo")
+
+
+def modo_uvicorn(args):
+    """Arranca uvicorn con cada número de workers y barre los niveles de concurrencia."""
+    resultados = []
+    for workers in args.workers:
+        # Cada servidor usa una BD temporal nueva para no tocar dhondt.sqlite3;
+        # el directorio se borra cuando el servidor ya ha terminado
+        with tempfile.TemporaryDirectory() as directorio:
+            entorno = dict(os.environ, DHONDT_DB_PATH=str(Path(directorio) / "carga.sqlite3"))
+            proceso = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "main:app",
+                 "--host", "127.0.0.1", "--port", str(args.puerto),
+                 "--workers", str(workers), "--log-level", "warning"],
+                cwd=BACKEND_DIR,
+                env=entorno,
+            )
+            try:
+                cliente = ClienteHTTP(f"http://127.0.0.1:{args.puerto}")
+                _esperar_servidor(cliente, proceso)
+                informes = _barrido_concurrencia(cliente, args, f"{workers} workers, ")
+                resultados.append({"modo": "uvicorn", "workers": workers, "informes": informes})
+            finally:
+                proceso.terminate()
+                try:
+                    proceso.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    proceso.kill()
+                    proceso.wait()
+    return resultados
+
+
+def modo_url(args):
+    """Carga contra un servidor ya levantado."""
+    informes = _barrido_concurrencia(ClienteHTTP(args.url), args, f"{args.url}, ")
+    return [{"modo": "url", "workers": None, "informes": informes}]
+
+
+# ============================================================
+# LÍNEA DE COMANDOS
+# ============================================================
+
+def _lista_enteros(texto):
+    return [int(x) for x in texto.split(",") if x.strip()]
+
+
+def _rango(texto):
+    minimo, _, maximo = texto.partition("-")
+    minimo = int(minimo)
+    maximo = int(maximo) if maximo else minimo
+    if minimo < 1 or maximo < minimo:
+        raise argparse.ArgumentTypeError(f"Rango no válido: {texto}")
+    return minimo, maximo
+
+
+def _mezcla(texto):
+    mezcla = {}
+    for parte in texto.split(","):
+        nombre, _, peso = parte.partition("=")
+        nombre = nombre.strip()
+        if nombre not in MEZCLA_POR_DEFECTO:
+            raise argparse.ArgumentTypeError(f"Operación desconocida en la mezcla: {nombre}")
+        mezcla[nombre] = float(peso)
+    if not mezcla or sum(mezcla.values()) <= 0:
+        raise argparse.ArgumentTypeError("La mezcla debe tener algún peso positivo")
+    return mezcla
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pruebas de carga de la API D'Hondt")
+    parser.add_argument("--modo", choices=["proceso", "uvicorn", "url"], default="proceso")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="servidor para el modo url")
+    parser.add_argument("--puerto", type=int, default=8123, help="puerto para el modo uvicorn")
+    parser.add_argument("--workers", type=_lista_enteros, default=[1, 2, 4],
+                        help="workers de uvicorn a probar, p. ej. 1,2,4")
+    parser.add_argument("--concurrencia", type=_lista_enteros, default=[1, 4, 16],
+                        help="clientes concurrentes a probar, p. ej. 1,4,16")
+    parser.add_argument("--duracion", type=float, default=10.0, help="segundos por nivel")
+    parser.add_argument("--usuarios", type=int, default=20,
+                        help="usuarios sintéticos (como mínimo, uno por hilo)")
+    parser.add_argument("--simulaciones", type=int, default=SIMULACIONES_INICIALES,
+                        help="simulaciones que se crean para cada usuario antes de medir")
+    parser.add_argument("--partidos", type=_rango, default=(3, 12), help="rango de partidos, p. ej. 3-12")
+    parser.add_argument("--escanos", type=_rango, default=(5, 350), help="rango de escaños, p. ej. 5-350")
+    parser.add_argument("--mezcla", type=_mezcla, default=dict(MEZCLA_POR_DEFECTO),
+                        help="pesos, p. ej. calcular=60,login=5,listar=15,detalle=10,"
+                             "crear=5,actualizar=3,eliminar=2")
+    parser.add_argument("--semilla", type=int, default=None, help="semilla para repetir la carga")
+    parser.add_argument("--salida", help="guarda el informe completo en JSON (para comparar builds)")
+    args = parser.parse_args()
+
+    try:
+        if args.modo == "proceso":
+            resultados = modo_proceso(args)
+        elif args.modo == "uvicorn":
+            resultados = modo_uvicorn(args)
+        else:
+            resultados = modo_url(args)
+    except RuntimeError as e:
+        sys.exit(f"Error en la preparación de la carga: {e}")
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+        print(f"\nInforme guardado en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
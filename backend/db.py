@@ -1,10 +1,12 @@
 # backend/db.py  (VERSIÓN DEPLOY: usa SQLite en lugar de MySQL)
 
+import os
 import sqlite3
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
-DB_PATH = BASE_DIR / "dhondt.sqlite3"
+# La ruta se puede cambiar con DHONDT_DB_PATH (p. ej. para pruebas de carga sin tocar la BD real)
+DB_PATH = Path(os.environ.get("DHONDT_DB_PATH") or BASE_DIR / "dhondt.sqlite3")
 
 
 def get_connection():
@@ -17,7 +19,7 @@ def get_connection():
 def init_db():
     """
     Crea las tablas necesarias si no existen.
-    Versión mínima para registro/login y simulaciones.
+    Versión mínima para registro/login, simulaciones y trabajos en segundo plano.
     """
     conn = get_connection()
     cur = conn.cursor()
@@ -41,5 +43,31 @@ def init_db():
         )
     """)
 
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS trabajos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tipo TEXT NOT NULL,
+            estado TEXT NOT NULL DEFAULT 'pendiente',
+            prioridad INTEGER NOT NULL DEFAULT 0,
+            pesado INTEGER NOT NULL DEFAULT 1,
+            usuario_id INTEGER,
+            parametros_json TEXT NOT NULL,
+            progreso REAL NOT NULL DEFAULT 0,
+            resultado_json TEXT,
+            error TEXT,
+            cancelar INTEGER NOT NULL DEFAULT 0,
+            propietario TEXT,
+            latido TIMESTAMP,
+            fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            fecha_inicio TIMESTAMP,
+            fecha_fin TIMESTAMP
+        )
+    """)
+
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_trabajos_estado
+        ON trabajos (estado, prioridad DESC, id)
+    """)
+
     conn.commit()
     conn.close()
@@ -0,0 +1,421 @@
+# backend/historico.py
+#
+# Almacén de resultados electorales históricos.
+#
+# Los CSV oficiales se importan una vez a un fichero binario por columnas
+# (HISTORICO_PATH, configurable con DHONDT_HISTORICO_PATH) que luego se abre con mmap. Así todos los procesos del
+# servidor comparten los mismos datos a través de la caché de páginas del
+# sistema operativo, sin cargarlos en objetos Python. Si se vuelve a importar,
+# los procesos detectan el fichero nuevo y lo mapean de nuevo sin reiniciar.
+#
+# Formato del fichero (little-endian):
+#   - cabecera: MAGIC, versión, número de columnas y (offset, bytes) de cada una
+#   - tabla de cadenas ordenada (nombres de elecciones, circunscripciones y partidos)
+#   - tabla de elecciones y tabla de circunscripciones, ordenadas por
+#     (elección, año[, circunscripción]) para buscarlas con búsqueda binaria
+#   - filas de partidos (id de cadena, votos) de cada elección y circunscripción
+
+import argparse
+import csv
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+# La ruta se puede cambiar con DHONDT_HISTORICO_PATH; el servidor lee el fichero de ahí
+HISTORICO_PATH = Path(os.environ.get("DHONDT_HISTORICO_PATH") or BASE_DIR / "historico.dhd")
+
+MAGIC = b"DHONDTH\0"
+VERSION = 1
+
+# Columnas del fichero, en orden: (nombre, tipo de array)
+COLUMNAS = [
+    ("cadenas_offsets", "Q"),
+    ("cadenas_datos", "B"),
+    ("elec_eleccion", "I"),
+    ("elec_anio", "I"),
+    ("elec_escanos", "I"),
+    ("elec_blanco", "Q"),
+    ("elec_nulos", "Q"),
+    ("elec_fila_inicio", "I"),
+    ("elec_num_filas", "I"),
+    ("circ_eleccion", "I"),
+    ("circ_anio", "I"),
+    ("circ_circunscripcion", "I"),
+    ("circ_escanos", "I"),
+    ("circ_blanco", "Q"),
+    ("circ_nulos", "Q"),
+    ("circ_fila_inicio", "I"),
+    ("circ_num_filas", "I"),
+    ("elec_fila_partido", "I"),
+    ("elec_fila_votos", "Q"),
+    ("circ_fila_partido", "I"),
+    ("circ_fila_votos", "Q"),
+]
+
+# Columnas obligatorias del CSV (se admite "año" como sinónimo de "anio")
+CAMPOS_CSV = ["eleccion", "anio", "circunscripcion", "escanos",
+              "partido", "votos", "votos_blanco", "votos_nulos"]
+
+
+# ============================================================
+# IMPORTACIÓN DESDE CSV
+# ============================================================
+
+def _entero(fila, campo, linea):
+    """Convierte un campo del CSV a entero no negativo con un error claro si no lo es."""
+    valor = (fila.get(campo) or "").strip()
+    try:
+        numero = int(valor)
+    except ValueError:
+        raise ValueError(f"Línea {linea}: el campo '{campo}' debe ser un número entero ('{valor}')")
+    if numero < 0:
+        raise ValueError(f"Línea {linea}: el campo '{campo}' no puede ser negativo")
+    return numero
+
+
+def _leer_csv(ruta, circunscripciones):
+    """
+    Lee un CSV (separado por comas, punto y coma o tabuladores) y acumula en
+    `circunscripciones` {(eleccion, anio, circ): {escanos, blanco, nulos, partidos}}.
+    """
+    with open(ruta, newline="", encoding="utf-8-sig") as f:
+        muestra = f.read(4096)
+        f.seek(0)
+        try:
+            dialecto = csv.Sniffer().sniff(muestra, delimiters=",;\t")
+        except csv.Error:
+            dialecto = csv.excel
+        lector = csv.DictReader(f, dialect=dialecto)
+        lector.fieldnames = [
+            "anio" if c.strip().lower() == "año" else c.strip().lower()
+            for c in (lector.fieldnames or [])
+        ]
+
+        faltan = [c for c in CAMPOS_CSV if c not in lector.fieldnames]
+        if faltan:
+            raise ValueError(f"{ruta}: faltan columnas {', '.join(faltan)}")
+
+        for linea, fila in enumerate(lector, start=2):
+            eleccion = fila["eleccion"].strip()
+            circ = fila["circunscripcion"].strip()
+            partido = fila["partido"].strip()
+            if not eleccion or not circ or not partido:
+                raise ValueError(f"{ruta}, línea {linea}: elección, circunscripción y partido son obligatorios")
+
+            clave = (eleccion, _entero(fila, "anio", linea), circ)
+            cabecera = (
+                _entero(fila, "escanos", linea),
+                _entero(fila, "votos_blanco", linea),
+                _entero(fila, "votos_nulos", linea),
+            )
+
+            datos = circunscripciones.get(clave)
+            if datos is None:
+                datos = {"cabecera": cabecera, "partidos": {}}
+                circunscripciones[clave] = datos
+            elif datos["cabecera"] != cabecera:
+                raise ValueError(
+                    f"{ruta}, línea {linea}: escaños, blancos o nulos distintos "
+                    f"para la misma circunscripción {circ}"
+                )
+
+            # Si un partido aparece dos veces en la misma circunscripción, sumo sus votos
+            votos = _entero(fila, "votos", linea)
+            datos["partidos"][partido] = datos["partidos"].get(partido, 0) + votos
+
+
+def importar_csv(rutas_csv, ruta_salida=HISTORICO_PATH):
+    """
+    Importa uno o varios CSV de resultados oficiales y escribe el fichero binario.
+
+    Cada fila del CSV es un partido en una circunscripción:
+        eleccion, anio, circunscripcion, escanos, partido, votos, votos_blanco, votos_nulos
+    (escanos, votos_blanco y votos_nulos se repiten en todas las filas de la circunscripción).
+
+    Devuelve el número de circunscripciones importadas.
+    """
+    circunscripciones = {}
+    for ruta in rutas_csv:
+        _leer_csv(ruta, circunscripciones)
+
+    # Tabla de cadenas ordenada: así el orden de los ids coincide con el de los textos
+    cadenas = set()
+    for (eleccion, _, circ), datos in circunscripciones.items():
+        cadenas.add(eleccion)
+        cadenas.add(circ)
+        cadenas.update(datos["partidos"])
+    cadenas = sorted(cadenas)
+    id_cadena = {c: i for i, c in enumerate(cadenas)}
+
+    col = {nombre: array(tipo) for nombre, tipo in COLUMNAS}
+
+    col["cadenas_offsets"].append(0)
+    for c in cadenas:
+        col["cadenas_datos"].frombytes(c.encode("utf-8"))
+        col["cadenas_offsets"].append(len(col["cadenas_datos"]))
+
+    # Circunscripciones ordenadas por (elección, año, circunscripción)
+    claves = sorted(circunscripciones, key=lambda k: (id_cadena[k[0]], k[1], id_cadena[k[2]]))
+    for eleccion, anio, circ in claves:
+        datos = circunscripciones[(eleccion, anio, circ)]
+        escanos, blanco, nulos = datos["cabecera"]
+        col["circ_eleccion"].append(id_cadena[eleccion])
+        col["circ_anio"].append(anio)
+        col["circ_circunscripcion"].append(id_cadena[circ])
+        col["circ_escanos"].append(escanos)
+        col["circ_blanco"].append(blanco)
+        col["circ_nulos"].append(nulos)
+        col["circ_fila_inicio"].append(len(col["circ_fila_partido"]))
+        col["circ_num_filas"].append(len(datos["partidos"]))
+        # Dentro de cada circunscripción, los partidos van de más a menos votos
+        for partido, votos in sorted(datos["partidos"].items(), key=lambda p: -p[1]):
+            col["circ_fila_partido"].append(id_cadena[partido])
+            col["circ_fila_votos"].append(votos)
+
+    # Totales por elección (suma de todas sus circunscripciones)
+    elecciones = {}
+    for eleccion, anio, circ in claves:
+        escanos, blanco, nulos = circunscripciones[(eleccion, anio, circ)]["cabecera"]
+        total = elecciones.setdefault((eleccion, anio), {"cabecera": [0, 0, 0], "partidos": {}})
+        total["cabecera"][0] += escanos
+        total["cabecera"][1] += blanco
+        total["cabecera"][2] += nulos
+        for partido, votos in circunscripciones[(eleccion, anio, circ)]["partidos"].items():
+            total["partidos"][partido] = total["partidos"].get(partido, 0) + votos
+
+    for eleccion, anio in sorted(elecciones, key=lambda k: (id_cadena[k[0]], k[1])):
+        total = elecciones[(eleccion, anio)]
+        col["elec_eleccion"].append(id_cadena[eleccion])
+        col["elec_anio"].append(anio)
+        col["elec_escanos"].append(total["cabecera"][0])
+        col["elec_blanco"].append(total["cabecera"][1])
+        col["elec_nulos"].append(total["cabecera"][2])
+        col["elec_fila_inicio"].append(len(col["elec_fila_partido"]))
+        col["elec_num_filas"].append(len(total["partidos"]))
+        for partido, votos in sorted(total["partidos"].items(), key=lambda p: -p[1]):
+            col["elec_fila_partido"].append(id_cadena[partido])
+            col["elec_fila_votos"].append(votos)
+
+    _escribir(col, ruta_salida)
+    return len(claves)
+
+
+def _escribir(col, ruta_salida):
+    """Escribe las columnas alineadas a 8 bytes detrás de la cabecera."""
+    tam_cabecera = len(MAGIC) + struct.calcsize("<II") + struct.calcsize("<QQ") * len(COLUMNAS)
+    offset = (tam_cabecera + 7) // 8 * 8
+
+    bloques = []
+    indice = []
+    for nombre, _ in COLUMNAS:
+        datos = col[nombre]
+        if sys.byteorder == "big":
+            datos.byteswap()
+        contenido = datos.tobytes()
+        indice.append((offset, len(contenido)))
+        relleno = b"\0" * ((8 - len(contenido) % 8) % 8)
+        bloques.append(contenido + relleno)
+        offset += len(contenido) + len(relleno)
+
+    cabecera = MAGIC + struct.pack("<II", VERSION, len(COLUMNAS))
+    for off, tam in indice:
+        cabecera += struct.pack("<QQ", off, tam)
+    cabecera += b"\0" * ((8 - len(cabecera) % 8) % 8)
+
+    # Escribo a un temporal y lo renombro para que los lectores nunca vean un fichero a medias
+    ruta_salida = Path(ruta_salida)
+    temporal = ruta_salida.with_suffix(ruta_salida.suffix + ".tmp")
+    with open(temporal, "wb") as f:
+        f.write(cabecera)
+        for bloque in bloques:
+            f.write(bloque)
+    temporal.replace(ruta_salida)
+
+
+# ============================================================
+# LECTURA (mmap)
+# ============================================================
+
+class AlmacenHistorico:
+    """
+    Acceso de solo lectura al fichero histórico mediante mmap.
+    Cada columna es un memoryview tipado sobre el mapa, sin copiar datos.
+    """
+
+    def __init__(self, ruta=HISTORICO_PATH):
+        if sys.byteorder == "big":
+            raise ValueError("El almacén histórico solo está soportado en máquinas little-endian")
+
+        with open(ruta, "rb") as f:
+            # Guardo la firma del fichero que mapeo para detectar reimportaciones
+            self.firma = _firma(os.fstat(f.fileno()))
+            self._mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mapa[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{ruta} no es un fichero histórico válido")
+        version, num_columnas = struct.unpack_from("<II", self._mapa, len(MAGIC))
+        if version != VERSION or num_columnas != len(COLUMNAS):
+            raise ValueError(f"{ruta}: versión de formato no soportada")
+
+        vista = memoryview(self._mapa)
+        inicio = len(MAGIC) + struct.calcsize("<II")
+        for i, (nombre, tipo) in enumerate(COLUMNAS):
+            off, tam = struct.unpack_from("<QQ", self._mapa, inicio + i * struct.calcsize("<QQ"))
+            setattr(self, nombre, vista[off:off + tam].cast(tipo))
+
+    # -----------------------------
+    # Cadenas
+    # -----------------------------
+    def _cadena(self, i):
+        ini = self.cadenas_offsets[i]
+        fin = self.cadenas_offsets[i + 1]
+        return bytes(self.cadenas_datos[ini:fin]).decode("utf-8")
+
+    def _buscar_cadena(self, texto):
+        """Búsqueda binaria en la tabla de cadenas (está ordenada). Devuelve el id o None."""
+        bajo, alto = 0, len(self.cadenas_offsets) - 1
+        while bajo < alto:
+            medio = (bajo + alto) // 2
+            if self._cadena(medio) < texto:
+                bajo = medio + 1
+            else:
+                alto = medio
+        if bajo < len(self.cadenas_offsets) - 1 and self._cadena(bajo) == texto:
+            return bajo
+        return None
+
+    # -----------------------------
+    # Búsquedas en las tablas ordenadas
+    # -----------------------------
+    def _primera_circ(self, clave):
+        """Primer índice de circunscripción con (elección, año, circ) >= clave."""
+        bajo, alto = 0, len(self.circ_eleccion)
+        while bajo < alto:
+            medio = (bajo + alto) // 2
+            actual = (self.circ_eleccion[medio], self.circ_anio[medio],
+                      self.circ_circunscripcion[medio])
+            if actual < clave:
+                bajo = medio + 1
+            else:
+                alto = medio
+        return bajo
+
+    def _buscar_eleccion(self, id_eleccion, anio):
+        bajo, alto = 0, len(self.elec_eleccion)
+        while bajo < alto:
+            medio = (bajo + alto) // 2
+            if (self.elec_eleccion[medio], self.elec_anio[medio]) < (id_eleccion, anio):
+                bajo = medio + 1
+            else:
+                alto = medio
+        if (bajo < len(self.elec_eleccion)
+                and self.elec_eleccion[bajo] == id_eleccion and self.elec_anio[bajo] == anio):
+            return bajo
+        return None
+
+    def _peticion(self, prefijo, i):
+        """Construye el diccionario con la forma de PeticionCalculo para la fila i."""
+        escanos = getattr(self, f"{prefijo}_escanos")
+        blanco = getattr(self, f"{prefijo}_blanco")
+        nulos = getattr(self, f"{prefijo}_nulos")
+        inicio = getattr(self, f"{prefijo}_fila_inicio")[i]
+        num = getattr(self, f"{prefijo}_num_filas")[i]
+        partidos = getattr(self, f"{prefijo}_fila_partido")
+        votos = getattr(self, f"{prefijo}_fila_votos")
+        return {
+            "num_escanos": escanos[i],
+            "votos_blanco": blanco[i],
+            "votos_nulos": nulos[i],
+            "partidos": [
+                {"nombre": self._cadena(partidos[j]), "votos": votos[j]}
+                for j in range(inicio, inicio + num)
+            ],
+        }
+
+    # -----------------------------
+    # API pública
+    # -----------------------------
+    def elecciones(self):
+        """Lista de (elección, año, escaños totales) disponibles."""
+        return [
+            (self._cadena(self.elec_eleccion[i]), self.elec_anio[i], self.elec_escanos[i])
+            for i in range(len(self.elec_eleccion))
+        ]
+
+    def circunscripciones(self, eleccion, anio):
+        """Nombres de las circunscripciones de una elección (None si no existe)."""
+        id_eleccion = self._buscar_cadena(eleccion)
+        if id_eleccion is None or self._buscar_eleccion(id_eleccion, anio) is None:
+            return None
+        inicio = self._primera_circ((id_eleccion, anio, 0))
+        fin = self._primera_circ((id_eleccion, anio + 1, 0))
+        return [self._cadena(self.circ_circunscripcion[i]) for i in range(inicio, fin)]
+
+    def circunscripcion(self, eleccion, anio, circunscripcion):
+        """Datos de una circunscripción con la forma de PeticionCalculo (None si no existe)."""
+        id_eleccion = self._buscar_cadena(eleccion)
+        id_circ = self._buscar_cadena(circunscripcion)
+        if id_eleccion is None or id_circ is None:
+            return None
+        clave = (id_eleccion, anio, id_circ)
+        i = self._primera_circ(clave)
+        if i >= len(self.circ_eleccion):
+            return None
+        if (self.circ_eleccion[i], self.circ_anio[i], self.circ_circunscripcion[i]) != clave:
+            return None
+        return self._peticion("circ", i)
+
+    def eleccion(self, eleccion, anio):
+        """Totales de toda la elección con la forma de PeticionCalculo (None si no existe)."""
+        id_eleccion = self._buscar_cadena(eleccion)
+        if id_eleccion is None:
+            return None
+        i = self._buscar_eleccion(id_eleccion, anio)
+        if i is None:
+            return None
+        return self._peticion("elec", i)
+
+
+def _firma(estado):
+    """Identifica una versión concreta del fichero (inodo, fecha de modificación y tamaño)."""
+    return (estado.st_ino, estado.st_mtime_ns, estado.st_size)
+
+
+# Un único almacén por proceso; se abre la primera vez que se usa
+_almacen = None
+_cerrojo = threading.Lock()
+
+
+def obtener_almacen():
+    """
+    Devuelve el almacén histórico abierto, o None si todavía no se ha importado nada.
+
+    importar_csv sustituye el fichero renombrando uno nuevo encima, así que en cada
+    llamada compruebo con stat() si ha cambiado y, si es así, vuelvo a mapearlo.
+    El mapa anterior se libera cuando nadie lo está usando.
+    """
+    global _almacen
+    try:
+        firma = _firma(os.stat(HISTORICO_PATH))
+    except FileNotFoundError:
+        return None
+
+    with _cerrojo:
+        if _almacen is None or _almacen.firma != firma:
+            _almacen = AlmacenHistorico(HISTORICO_PATH)
+        return _almacen
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importa CSV de resultados históricos")
+    parser.add_argument("csv", nargs="+", help="ficheros CSV con los resultados oficiales")
+    parser.add_argument("-o", "--salida", default=str(HISTORICO_PATH), help="fichero de salida (el servidor lo lee de DHONDT_HISTORICO_PATH)")
+    args = parser.parse_args()
+
+    total = importar_csv(args.csv, args.salida)
+    print(f"Importadas {total} circunscripciones en {args.salida}")
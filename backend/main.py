@@ -5,15 +5,22 @@ from pathlib import Path
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Tuple
+from pydantic import BaseModel, Field, model_validator
+from typing import Any, List, Literal, Tuple
 from datetime import datetime
+from decimal import Decimal
 import json
 import hashlib
 from db import get_connection, init_db
 
 # Importo la función que hace el cálculo D'Hondt
 from dhondt import dhondt
+# Importo el cálculo de la mínima transferencia de votos
+from transferencias import transferencia_minima, aplicar_plan, MINIMO, MAXIMO
+# Importo el gestor de trabajos en segundo plano
+from trabajos import GestorTrabajos, COMPLETADO
+# Importo el almacén de resultados históricos (fichero mmap)
+from historico import obtener_almacen
 # Importo la función que abre la conexión con MySQL
 from db import get_connection
 
@@ -127,6 +134,148 @@ class LoginUsuario(BaseModel):
     password: str
 
 
+class PeticionTransferencia(BaseModel):
+    """
+    Cuerpo de la petición /transferencia_minima.
+    Es el escenario de /calcular más el objetivo de escaños:
+    - tipo_objetivo "minimo": el partido debe llegar al menos a escanos_objetivo
+      (por defecto, la mayoría absoluta).
+    - tipo_objetivo "maximo": el partido debe quedarse como mucho en escanos_objetivo
+      (por defecto, justo por debajo de la mayoría absoluta).
+    donantes y receptores limitan de qué partidos pueden salir y a cuáles pueden ir los votos.
+    """
+    num_escanos: int
+    votos_blanco: int = 0
+    votos_nulos: int = 0
+    umbral_porcentaje: float = 0.0
+    partidos: List[PartidoEntrada]
+    partido_objetivo: str
+    tipo_objetivo: str = MINIMO
+    escanos_objetivo: int | None = None
+    donantes: List[str] | None = None
+    receptores: List[str] | None = None
+
+
+class Transferencia(BaseModel):
+    """Un movimiento de votos de un partido a otro."""
+    origen: str
+    destino: str
+    votos: int
+
+
+class RespuestaTransferencia(BaseModel):
+    """Plan mínimo de transferencia y reparto resultante tras aplicarlo."""
+    partido_objetivo: str
+    tipo_objetivo: str
+    escanos_objetivo: int
+    escanos_actuales: int
+    votos_transferidos: int
+    transferencias: List[Transferencia]
+    resultado: RespuestaCalculo
+
+
+# Prioridad máxima que puede pedir un cliente para sus trabajos
+MAX_PRIORIDAD_TRABAJO = 10
+
+
+class PeticionTrabajo(BaseModel):
+    """
+    Cuerpo de la petición para lanzar un trabajo en segundo plano.
+    Los parámetros dependen del tipo (barrido, lote, recalcular_simulaciones).
+    Cuanto mayor es la prioridad (de 0 a MAX_PRIORIDAD_TRABAJO), antes se ejecuta;
+    la acoto para que un cliente no pueda adelantarse siempre a los demás.
+    El trabajo pertenece al usuario que lo lanza.
+    """
+    usuario_id: int
+    tipo: str
+    parametros: dict = {}
+    prioridad: int = Field(0, ge=0, le=MAX_PRIORIDAD_TRABAJO)
+
+
+class EstadoTrabajo(BaseModel):
+    """Estado y progreso de un trabajo en segundo plano."""
+    id: int
+    tipo: str
+    estado: str
+    prioridad: int = 0
+    progreso: float = 0.0
+    error: str | None = None
+    fecha_creacion: datetime | None = None
+    fecha_inicio: datetime | None = None
+    fecha_fin: datetime | None = None
+
+
+class ResultadoTrabajo(BaseModel):
+    """Resultado de un trabajo ya completado."""
+    id: int
+    tipo: str
+    resultado: Any
+
+
+class EleccionHistorica(BaseModel):
+    """Elección disponible en el almacén histórico."""
+    eleccion: str
+    anio: int
+    num_escanos: int
+
+
+# Máximo de cálculos que puede generar un barrido
+MAX_PUNTOS_BARRIDO = 10000
+
+
+class ParametrosBarrido(BaseModel):
+    """
+    Barrido de un parámetro (num_escanos o umbral_porcentaje) sobre un escenario.
+    El rango se comprueba al validar, así que un barrido incorrecto se rechaza
+    al encolarlo y no cuando ya está en ejecución.
+    """
+    escenario: PeticionCalculo
+    campo: Literal["num_escanos", "umbral_porcentaje"] = "num_escanos"
+    desde: float
+    hasta: float
+    paso: float = 1
+
+    @model_validator(mode="after")
+    def _comprobar_rango(self):
+        if self.paso <= 0 or self.hasta < self.desde:
+            raise ValueError("El rango del barrido no es válido")
+        desde, hasta, paso = self._rango()
+        if self.campo == "num_escanos" and any(v != v.to_integral_value() for v in (desde, hasta, paso)):
+            raise ValueError("Para num_escanos, desde, hasta y paso deben ser números enteros")
+        if self.total() > MAX_PUNTOS_BARRIDO:
+            raise ValueError(f"El barrido no puede superar {MAX_PUNTOS_BARRIDO} cálculos")
+        return self
+
+    def _rango(self) -> Tuple[Decimal, Decimal, Decimal]:
+        # Uso Decimal para que, por ejemplo, de 0 a 0.3 de 0.1 en 0.1 salgan 4 valores
+        return Decimal(str(self.desde)), Decimal(str(self.hasta)), Decimal(str(self.paso))
+
+    def total(self) -> int:
+        """Número de cálculos del barrido."""
+        desde, hasta, paso = self._rango()
+        return int((hasta - desde) / paso) + 1
+
+    def valores(self) -> List[Any]:
+        """Valores que toma el campo, como int para num_escanos y float para el umbral."""
+        desde, _, paso = self._rango()
+        convertir = int if self.campo == "num_escanos" else float
+        return [convertir(desde + i * paso) for i in range(self.total())]
+
+
+class ParametrosLote(BaseModel):
+    """Lote de cálculos independientes."""
+    peticiones: List[PeticionCalculo]
+
+
+class ParametrosRecalculo(BaseModel):
+    """
+    Recalcular las simulaciones guardadas de un usuario.
+    Desde la API siempre es el usuario que lanza el trabajo; None (todas las
+    simulaciones) solo se admite encolando el trabajo desde el propio servidor.
+    """
+    usuario_id: int | None = None
+
+
 # ============================================================
 # FUNCIONES AUXILIARES DE NEGOCIO
 # ============================================================
@@ -148,20 +297,20 @@ def _comprobar_simulacion_duplicada(usuario_id: int, nombre: str, excluir_id: in
     """
     try:
         conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
 
         if excluir_id is None:
             sql = """
                 SELECT id
                 FROM simulaciones
-                WHERE usuario_id = %s AND nombre = %s
+                WHERE usuario_id = ? AND nombre = ?
             """
             params = (usuario_id, nombre)
         else:
             sql = """
                 SELECT id
                 FROM simulaciones
-                WHERE usuario_id = %s AND nombre = %s AND id != %s
+                WHERE usuario_id = ? AND nombre = ? AND id != ?
             """
             params = (usuario_id, nombre, excluir_id)
 
@@ -302,6 +451,105 @@ def procesar_simulacion(
     return respuesta, datos_para_guardar
 
 
+# ============================================================
+# TRABAJOS EN SEGUNDO PLANO
+# ============================================================
+
+def _calcular_peticion(peticion: PeticionCalculo) -> dict:
+    """Calcula una petición y devuelve el resultado o el error como diccionario."""
+    try:
+        respuesta, _ = procesar_simulacion(
+            num_escanos=peticion.num_escanos,
+            votos_blanco=peticion.votos_blanco,
+            votos_nulos=peticion.votos_nulos,
+            umbral_porcentaje=peticion.umbral_porcentaje,
+            partidos=peticion.partidos,
+        )
+    except HTTPException as e:
+        return {"error": e.detail}
+    return {"resultado": respuesta.dict()}
+
+
+def trabajo_barrido(parametros: ParametrosBarrido, contexto) -> list:
+    """Repite el cálculo variando num_escanos o umbral_porcentaje entre desde y hasta."""
+    valores = parametros.valores()
+    total = len(valores)
+    resultados = []
+    for i, valor in enumerate(valores):
+        peticion = parametros.escenario.copy(update={parametros.campo: valor})
+        resultados.append({"valor": valor, **_calcular_peticion(peticion)})
+        contexto.progreso(i + 1, total)
+    return resultados
+
+
+def trabajo_lote(parametros: ParametrosLote, contexto) -> list:
+    """Calcula una lista de peticiones independientes."""
+    resultados = []
+    total = len(parametros.peticiones)
+    for i, peticion in enumerate(parametros.peticiones):
+        resultados.append(_calcular_peticion(peticion))
+        contexto.progreso(i + 1, total)
+    return resultados
+
+
+def trabajo_recalcular_simulaciones(parametros: ParametrosRecalculo, contexto) -> dict:
+    """
+    Vuelve a pasar todas las simulaciones guardadas por procesar_simulacion
+    (por ejemplo, tras un cambio en el motor de cálculo) y actualiza su JSON.
+    """
+    conn = get_connection()
+    try:
+        if parametros.usuario_id is None:
+            filas = conn.execute("SELECT id, datos_json FROM simulaciones").fetchall()
+        else:
+            filas = conn.execute(
+                "SELECT id, datos_json FROM simulaciones WHERE usuario_id = ?",
+                (parametros.usuario_id,),
+            ).fetchall()
+    finally:
+        conn.close()
+
+    actualizadas = 0
+    errores = []
+    total = len(filas)
+    for i, fila in enumerate(filas):
+        try:
+            datos = json.loads(fila["datos_json"])
+            _, datos_nuevos = procesar_simulacion(
+                num_escanos=datos["num_escanos"],
+                votos_blanco=datos.get("votos_blanco", 0),
+                votos_nulos=datos.get("votos_nulos", 0),
+                umbral_porcentaje=datos.get("umbral_porcentaje", 0.0),
+                partidos=[PartidoEntrada(**p) for p in datos["partidos"]],
+            )
+            datos_nuevos["nombre"] = datos.get("nombre")
+
+            conn = get_connection()
+            try:
+                conn.execute(
+                    "UPDATE simulaciones SET datos_json = ? WHERE id = ?",
+                    (json.dumps(datos_nuevos, ensure_ascii=False), fila["id"]),
+                )
+                conn.commit()
+            finally:
+                conn.close()
+            actualizadas += 1
+        except HTTPException as e:
+            errores.append({"id": fila["id"], "error": e.detail})
+        except (KeyError, TypeError, ValueError) as e:
+            errores.append({"id": fila["id"], "error": f"Datos guardados no válidos: {e}"})
+        contexto.progreso(i + 1, total)
+
+    return {"total": total, "actualizadas": actualizadas, "errores": errores}
+
+
+# Gestor único de trabajos para todo el servidor
+gestor_trabajos = GestorTrabajos()
+gestor_trabajos.registrar("barrido", ParametrosBarrido, trabajo_barrido)
+gestor_trabajos.registrar("lote", ParametrosLote, trabajo_lote)
+gestor_trabajos.registrar("recalcular_simulaciones", ParametrosRecalculo, trabajo_recalcular_simulaciones)
+
+
 # ============================================================
 # CREACIÓN DE LA APLICACIÓN FASTAPI
 # ============================================================
@@ -320,10 +568,17 @@ def servir_index():
     """Devuelve la página principal (index.html)."""
     return FileResponse(FRONTEND_DIR / "index.html")
 
-# Inicializar BD al arrancar el servidor
+# Inicializar BD al arrancar el servidor y poner en marcha los trabajos pendientes
 @app.on_event("startup")
 def startup_event():
     init_db()
+    gestor_trabajos.iniciar()
+
+
+# Parar los hilos de trabajos al apagar (lo que no termine se retoma al arrancar)
+@app.on_event("shutdown")
+def shutdown_event():
+    gestor_trabajos.detener()
 
 # Configuro CORS para poder llamar a la API desde el frontend (otro puerto)
 app.add_middleware(
@@ -361,6 +616,121 @@ def calcular_escanos(peticion: PeticionCalculo):
     return respuesta
 
 
+# Máximo de escaños para /transferencia_minima: el coste del cálculo crece con
+# el número de escaños y la petición se atiende de forma síncrona
+MAX_ESCANOS_TRANSFERENCIA = 400
+
+
+@app.post("/transferencia_minima", response_model=RespuestaTransferencia)
+def calcular_transferencia_minima(peticion: PeticionTransferencia):
+    """
+    Calcula la mínima cantidad de votos que habría que mover para que el partido
+    objetivo consiga al menos (tipo_objetivo "minimo") o se quede como mucho en
+    (tipo_objetivo "maximo") escanos_objetivo escaños.
+
+    Limitaciones:
+    - En "minimo" los votos siempre van al partido objetivo (darlos a otro partido
+      solo subiría cocientes rivales), así que si se indican receptores deben incluirlo.
+    - En "maximo" los votos siempre salen del partido objetivo, así que si se indican
+      donantes deben incluirlo.
+    En cualquier otro caso se devuelve un error 400, igual que si hay más de
+    MAX_ESCANOS_TRANSFERENCIA escaños.
+    """
+    if peticion.num_escanos > MAX_ESCANOS_TRANSFERENCIA:
+        raise HTTPException(
+            status_code=400,
+            detail=f"El cálculo de transferencias admite como máximo {MAX_ESCANOS_TRANSFERENCIA} escaños"
+        )
+
+    # Primero calculo el escenario actual (esto ya valida todos los datos)
+    respuesta_actual, _ = procesar_simulacion(
+        num_escanos=peticion.num_escanos,
+        votos_blanco=peticion.votos_blanco,
+        votos_nulos=peticion.votos_nulos,
+        umbral_porcentaje=peticion.umbral_porcentaje,
+        partidos=peticion.partidos,
+    )
+
+    votos_por_partido = {p.nombre: p.votos for p in peticion.partidos}
+    if peticion.partido_objetivo not in votos_por_partido:
+        raise HTTPException(status_code=400, detail="El partido objetivo no está en la lista de partidos")
+
+    if peticion.tipo_objetivo not in (MINIMO, MAXIMO):
+        raise HTTPException(status_code=400, detail="El tipo de objetivo debe ser 'minimo' o 'maximo'")
+
+    mayoria = peticion.num_escanos // 2 + 1
+    escanos_objetivo = peticion.escanos_objetivo
+    if peticion.tipo_objetivo == MINIMO:
+        if escanos_objetivo is None:
+            escanos_objetivo = mayoria
+        if escanos_objetivo < 1 or escanos_objetivo > peticion.num_escanos:
+            raise HTTPException(status_code=400, detail="Los escaños objetivo deben estar entre 1 y el número de escaños")
+    else:
+        if escanos_objetivo is None:
+            escanos_objetivo = mayoria - 1
+        if escanos_objetivo < 0 or escanos_objetivo >= peticion.num_escanos:
+            raise HTTPException(status_code=400, detail="Los escaños máximos deben estar entre 0 y el número de escaños menos uno")
+
+    for lista in (peticion.donantes, peticion.receptores):
+        desconocidos = [d for d in lista or [] if d not in votos_por_partido]
+        if desconocidos:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Partidos desconocidos: {', '.join(desconocidos)}"
+            )
+
+    escanos_actuales = next(
+        r.escanos for r in respuesta_actual.resultado if r.nombre == peticion.partido_objetivo
+    )
+
+    try:
+        plan = transferencia_minima(
+            votos_por_partido,
+            peticion.num_escanos,
+            peticion.partido_objetivo,
+            escanos_objetivo,
+            votos_minimos=respuesta_actual.votos_minimos_umbral,
+            donantes=peticion.donantes,
+            receptores=peticion.receptores,
+            tipo=peticion.tipo_objetivo,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if plan is None:
+        raise HTTPException(
+            status_code=400,
+            detail="No hay ninguna transferencia de votos que permita alcanzar ese objetivo"
+        )
+
+    # Aplico el plan sobre la tabla de partidos y recalculo el reparto
+    votos_nuevos = aplicar_plan(votos_por_partido, plan)
+    partidos_nuevos = [
+        PartidoEntrada(nombre=p.nombre, votos=votos_nuevos[p.nombre], color=p.color)
+        for p in peticion.partidos
+    ]
+
+    respuesta_nueva, _ = procesar_simulacion(
+        num_escanos=peticion.num_escanos,
+        votos_blanco=peticion.votos_blanco,
+        votos_nulos=peticion.votos_nulos,
+        umbral_porcentaje=peticion.umbral_porcentaje,
+        partidos=partidos_nuevos,
+    )
+
+    return RespuestaTransferencia(
+        partido_objetivo=peticion.partido_objetivo,
+        tipo_objetivo=peticion.tipo_objetivo,
+        escanos_objetivo=escanos_objetivo,
+        escanos_actuales=escanos_actuales,
+        votos_transferidos=sum(votos for _, _, votos in plan),
+        transferencias=[
+            Transferencia(origen=origen, destino=destino, votos=votos)
+            for origen, destino, votos in plan
+        ],
+        resultado=respuesta_nueva,
+    )
+
+
 # ============================================================
 # ENDPOINTS DE SIMULACIONES (CRUD básico)
 # ============================================================
@@ -397,7 +767,7 @@ def guardar_simulacion(peticion: PeticionGuardarSimulacion):
         cursor = conn.cursor()
         sql = """
             INSERT INTO simulaciones (nombre, datos_json, usuario_id)
-            VALUES (%s, %s, %s)
+            VALUES (?, ?, ?)
         """
         cursor.execute(
             sql,
@@ -421,11 +791,11 @@ def listar_simulaciones(usuario_id: int):
     """Devuelve la lista de simulaciones del usuario (para el listado del frontend)."""
     try:
         conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
         sql = """
             SELECT id, nombre, fecha
             FROM simulaciones
-            WHERE usuario_id = %s
+            WHERE usuario_id = ?
             ORDER BY fecha DESC
         """
         cursor.execute(sql, (usuario_id,))
@@ -435,7 +805,7 @@ def listar_simulaciones(usuario_id: int):
     except Exception:
         raise HTTPException(status_code=500, detail="Error interno al listar las simulaciones")
 
-    simulaciones = [SimulacionResumen(**fila) for fila in filas]
+    simulaciones = [SimulacionResumen(**dict(fila)) for fila in filas]
     return simulaciones
 
 
@@ -444,12 +814,12 @@ def obtener_simulacion(sim_id: int, usuario_id: int):
     """Devuelve el detalle completo de una simulación del usuario."""
     try:
         conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
         sql = """
             SELECT id, nombre, datos_json
             FROM simulaciones
-            WHERE id = %s
-              AND usuario_id = %s
+            WHERE id = ?
+              AND usuario_id = ?
         """
         cursor.execute(sql, (sim_id, usuario_id))
         fila = cursor.fetchone()
@@ -511,11 +881,11 @@ def actualizar_simulacion(sim_id: int, peticion: PeticionGuardarSimulacion):
         cursor = conn.cursor()
         sql = """
             UPDATE simulaciones
-            SET nombre = %s,
-                datos_json = %s,
-                usuario_id = %s
-            WHERE id = %s
-              AND usuario_id = %s
+            SET nombre = ?,
+                datos_json = ?,
+                usuario_id = ?
+            WHERE id = ?
+              AND usuario_id = ?
         """
         cursor.execute(
             sql,
@@ -546,7 +916,7 @@ def eliminar_simulacion(sim_id: int, usuario_id: int):
     try:
         conn = get_connection()
         cursor = conn.cursor()
-        sql = "DELETE FROM simulaciones WHERE id = %s AND usuario_id = %s"
+        sql = "DELETE FROM simulaciones WHERE id = ? AND usuario_id = ?"
         cursor.execute(sql, (sim_id, usuario_id))
         conn.commit()
         filas_afectadas = cursor.rowcount
@@ -561,6 +931,135 @@ def eliminar_simulacion(sim_id: int, usuario_id: int):
     return {"mensaje": "Simulación eliminada correctamente"}
 
 
+# ============================================================
+# ENDPOINTS DE TRABAJOS EN SEGUNDO PLANO
+# ============================================================
+
+@app.post("/trabajos", response_model=EstadoTrabajo)
+def crear_trabajo(peticion: PeticionTrabajo):
+    """
+    Encola un trabajo largo (barrido, lote o recalcular_simulaciones)
+    y devuelve enseguida su id para consultar el estado más tarde.
+    """
+    parametros = dict(peticion.parametros)
+
+    # Cada usuario solo puede recalcular sus propias simulaciones
+    if peticion.tipo == "recalcular_simulaciones":
+        if parametros.get("usuario_id", peticion.usuario_id) != peticion.usuario_id:
+            raise HTTPException(status_code=403, detail="Solo puedes recalcular tus propias simulaciones")
+        parametros["usuario_id"] = peticion.usuario_id
+
+    try:
+        trabajo_id = gestor_trabajos.encolar(
+            peticion.tipo,
+            parametros,
+            prioridad=peticion.prioridad,
+            usuario_id=peticion.usuario_id,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception:
+        raise HTTPException(status_code=500, detail="Error interno al crear el trabajo")
+
+    return EstadoTrabajo(**gestor_trabajos.obtener(trabajo_id))
+
+
+def _obtener_trabajo_usuario(trabajo_id: int, usuario_id: int) -> dict:
+    """Devuelve el trabajo si existe y pertenece al usuario (404 en otro caso)."""
+    try:
+        trabajo = gestor_trabajos.obtener(trabajo_id)
+    except Exception:
+        raise HTTPException(status_code=500, detail="Error interno al obtener el trabajo")
+    if trabajo is None or trabajo["usuario_id"] != usuario_id:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado o no pertenece al usuario")
+    return trabajo
+
+
+@app.get("/trabajos/{trabajo_id}", response_model=EstadoTrabajo)
+def obtener_trabajo(trabajo_id: int, usuario_id: int):
+    """Devuelve el estado y el progreso de un trabajo del usuario."""
+    return EstadoTrabajo(**_obtener_trabajo_usuario(trabajo_id, usuario_id))
+
+
+@app.get("/trabajos/{trabajo_id}/resultado", response_model=ResultadoTrabajo)
+def obtener_resultado_trabajo(trabajo_id: int, usuario_id: int):
+    """Devuelve el resultado de un trabajo completado del usuario."""
+    trabajo = _obtener_trabajo_usuario(trabajo_id, usuario_id)
+    if trabajo["estado"] != COMPLETADO:
+        raise HTTPException(
+            status_code=409,
+            detail=f"El trabajo no ha terminado (estado: {trabajo['estado']})"
+        )
+    return ResultadoTrabajo(
+        id=trabajo["id"],
+        tipo=trabajo["tipo"],
+        resultado=json.loads(trabajo["resultado_json"]),
+    )
+
+
+@app.delete("/trabajos/{trabajo_id}")
+def cancelar_trabajo(trabajo_id: int, usuario_id: int):
+    """Cancela un trabajo pendiente o en curso del usuario."""
+    _obtener_trabajo_usuario(trabajo_id, usuario_id)
+    if not gestor_trabajos.cancelar(trabajo_id):
+        raise HTTPException(status_code=400, detail="El trabajo ya había terminado")
+    return {"mensaje": "Cancelación solicitada"}
+
+
+# ============================================================
+# ENDPOINTS DE RESULTADOS HISTÓRICOS
+# ============================================================
+
+def _almacen_historico():
+    """Devuelve el almacén histórico o un 404 si todavía no se ha importado."""
+    try:
+        almacen = obtener_almacen()
+    except Exception:
+        raise HTTPException(status_code=500, detail="Error interno al abrir los datos históricos")
+    if almacen is None:
+        raise HTTPException(status_code=404, detail="No hay datos históricos cargados")
+    return almacen
+
+
+@app.get("/historico", response_model=List[EleccionHistorica])
+def listar_elecciones_historicas():
+    """Lista las elecciones históricas disponibles."""
+    return [
+        EleccionHistorica(eleccion=eleccion, anio=anio, num_escanos=escanos)
+        for eleccion, anio, escanos in _almacen_historico().elecciones()
+    ]
+
+
+@app.get("/historico/{eleccion}/{anio}/circunscripciones", response_model=List[str])
+def listar_circunscripciones_historicas(eleccion: str, anio: int):
+    """Lista las circunscripciones de una elección histórica."""
+    circunscripciones = _almacen_historico().circunscripciones(eleccion, anio)
+    if circunscripciones is None:
+        raise HTTPException(status_code=404, detail="Elección no encontrada")
+    return circunscripciones
+
+
+@app.get("/historico/{eleccion}/{anio}", response_model=PeticionCalculo)
+def obtener_eleccion_historica(eleccion: str, anio: int):
+    """
+    Devuelve los totales de toda una elección (suma de sus circunscripciones)
+    listos para enviarlos a /calcular.
+    """
+    datos = _almacen_historico().eleccion(eleccion, anio)
+    if datos is None:
+        raise HTTPException(status_code=404, detail="Elección no encontrada")
+    return PeticionCalculo(**datos)
+
+
+@app.get("/historico/{eleccion}/{anio}/{circunscripcion}", response_model=PeticionCalculo)
+def obtener_circunscripcion_historica(eleccion: str, anio: int, circunscripcion: str):
+    """Devuelve los resultados de una circunscripción listos para enviarlos a /calcular."""
+    datos = _almacen_historico().circunscripcion(eleccion, anio, circunscripcion)
+    if datos is None:
+        raise HTTPException(status_code=404, detail="Circunscripción no encontrada")
+    return PeticionCalculo(**datos)
+
+
 # ============================================================
 # REGISTRO Y LOGIN DE USUARIOS
 # ============================================================
@@ -600,7 +1099,7 @@ def registrar_usuario(datos: RegistroUsuario):
         cursor = conn.cursor()
 
         # Comprobamos si el nombre ya existe
-        cursor.execute("SELECT id FROM usuarios WHERE username = %s", (datos.username,))
+        cursor.execute("SELECT id FROM usuarios WHERE username = ?", (datos.username,))
         existe = cursor.fetchone()
         if existe:
             cursor.close()
@@ -614,7 +1113,7 @@ def registrar_usuario(datos: RegistroUsuario):
         password_hash = hash_password(password)
 
         cursor.execute(
-            "INSERT INTO usuarios (username, password_hash) VALUES (%s, %s)",
+            "INSERT INTO usuarios (username, password_hash) VALUES (?, ?)",
             (datos.username, password_hash)
         )
         conn.commit()
@@ -643,10 +1142,10 @@ def login(datos: LoginUsuario):
     """Comprueba las credenciales y devuelve el id y el nombre del usuario."""
     try:
         conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
 
         cursor.execute(
-            "SELECT id, password_hash FROM usuarios WHERE username = %s",
+            "SELECT id, password_hash FROM usuarios WHERE username = ?",
             (datos.username,)
         )
         fila = cursor.fetchone()
@@ -0,0 +1,151 @@
+# backend/test_historico.py
+#
+# Importa CSV pequeños a un fichero temporal y comprueba que el almacén
+# mapeado devuelve exactamente lo que había en la entrada.
+
+import pytest
+
+import historico
+from historico import AlmacenHistorico, importar_csv, obtener_almacen
+
+CABECERA = "eleccion,anio,circunscripcion,escanos,partido,votos,votos_blanco,votos_nulos\n"
+
+FILAS = [
+    "Generales,2023,Madrid,37,PP,1500000,20000,15000",
+    "Generales,2023,Madrid,37,PSOE,1200000,20000,15000",
+    "Generales,2023,Madrid,37,VOX,600000,20000,15000",
+    "Generales,2023,Ávila,3,PP,60000,1000,800",
+    "Generales,2023,Ávila,3,PSOE,40000,1000,800",
+    "Generales,2019,Madrid,37,PSOE,1000000,18000,14000",
+    "Generales,2019,Madrid,37,PP,800000,18000,14000",
+]
+
+
+def _csv(tmp_path, contenido, nombre="datos.csv", encoding="utf-8"):
+    ruta = tmp_path / nombre
+    ruta.write_text(contenido, encoding=encoding)
+    return ruta
+
+
+def _importar(tmp_path, contenido, **opciones):
+    salida = tmp_path / "historico.dhd"
+    total = importar_csv([_csv(tmp_path, contenido, **opciones)], salida)
+    return total, AlmacenHistorico(salida)
+
+
+def test_importar_y_consultar(tmp_path):
+    total, almacen = _importar(tmp_path, CABECERA + "\n".join(FILAS) + "\n")
+    assert total == 3
+
+    assert almacen.elecciones() == [("Generales", 2019, 37), ("Generales", 2023, 40)]
+    assert almacen.circunscripciones("Generales", 2023) == ["Madrid", "Ávila"]
+    assert almacen.circunscripciones("Generales", 2019) == ["Madrid"]
+    assert almacen.circunscripciones("Generales", 2020) is None
+    assert almacen.circunscripciones("Autonómicas", 2023) is None
+
+    assert almacen.circunscripcion("Generales", 2023, "Ávila") == {
+        "num_escanos": 3,
+        "votos_blanco": 1000,
+        "votos_nulos": 800,
+        "partidos": [{"nombre": "PP", "votos": 60000}, {"nombre": "PSOE", "votos": 40000}],
+    }
+    assert almacen.circunscripcion("Generales", 2019, "Ávila") is None
+    assert almacen.circunscripcion("Generales", 2023, "Soria") is None
+
+    # La elección completa suma escaños, blancos, nulos y votos de todas sus circunscripciones
+    assert almacen.eleccion("Generales", 2023) == {
+        "num_escanos": 40,
+        "votos_blanco": 21000,
+        "votos_nulos": 15800,
+        "partidos": [
+            {"nombre": "PP", "votos": 1560000},
+            {"nombre": "PSOE", "votos": 1240000},
+            {"nombre": "VOX", "votos": 600000},
+        ],
+    }
+    assert almacen.eleccion("Generales", 2020) is None
+
+
+def test_csv_vacio(tmp_path):
+    total, almacen = _importar(tmp_path, CABECERA)
+    assert total == 0
+    assert almacen.elecciones() == []
+    assert almacen.circunscripciones("Generales", 2023) is None
+    assert almacen.circunscripcion("Generales", 2023, "Madrid") is None
+    assert almacen.eleccion("Generales", 2023) is None
+
+
+def test_csv_sin_columnas(tmp_path):
+    with pytest.raises(ValueError, match="faltan columnas"):
+        _importar(tmp_path, "")
+    with pytest.raises(ValueError, match="faltan columnas"):
+        _importar(tmp_path, "eleccion,anio,partido,votos\nGenerales,2023,PP,1\n")
+
+
+def test_partido_repetido_suma_votos(tmp_path):
+    contenido = CABECERA + "\n".join([
+        "Generales,2023,Soria,2,PP,100,5,3",
+        "Generales,2023,Soria,2,PSOE,150,5,3",
+        "Generales,2023,Soria,2,PP,80,5,3",
+    ]) + "\n"
+    _, almacen = _importar(tmp_path, contenido)
+    assert almacen.circunscripcion("Generales", 2023, "Soria")["partidos"] == [
+        {"nombre": "PP", "votos": 180},
+        {"nombre": "PSOE", "votos": 150},
+    ]
+
+
+def test_cabecera_distinta_en_la_misma_circunscripcion(tmp_path):
+    contenido = CABECERA + "Generales,2023,Soria,2,PP,100,5,3\nGenerales,2023,Soria,3,PSOE,150,5,3\n"
+    with pytest.raises(ValueError, match="línea 3"):
+        _importar(tmp_path, contenido)
+
+
+def test_punto_y_coma_columna_año_y_bom(tmp_path):
+    contenido = (
+        "Eleccion;Año;Circunscripcion;Escanos;Partido;Votos;Votos_blanco;Votos_nulos\n"
+        "Generales;2023;Soria;2;PP;100;5;3\n"
+        "Generales;2023;Soria;2;PSOE;150;5;3\n"
+    )
+    _, almacen = _importar(tmp_path, contenido, encoding="utf-8-sig")
+    assert (tmp_path / "datos.csv").read_bytes().startswith(b"\xef\xbb\xbf")
+    assert almacen.elecciones() == [("Generales", 2023, 2)]
+    assert almacen.circunscripcion("Generales", 2023, "Soria")["partidos"] == [
+        {"nombre": "PSOE", "votos": 150},
+        {"nombre": "PP", "votos": 100},
+    ]
+
+
+def test_tabuladores(tmp_path):
+    contenido = CABECERA.replace(",", "\t") + "Generales\t2023\tSoria\t2\tPP\t100\t5\t3\n"
+    _, almacen = _importar(tmp_path, contenido)
+    assert almacen.circunscripciones("Generales", 2023) == ["Soria"]
+
+
+def test_votos_no_validos(tmp_path):
+    with pytest.raises(ValueError, match="'votos' debe ser un número entero"):
+        _importar(tmp_path, CABECERA + "Generales,2023,Soria,2,PP,muchos,5,3\n")
+    with pytest.raises(ValueError, match="'votos' no puede ser negativo"):
+        _importar(tmp_path, CABECERA + "Generales,2023,Soria,2,PP,-1,5,3\n")
+
+
+def test_reimportar_vuelve_a_mapear(tmp_path, monkeypatch):
+    salida = tmp_path / "historico.dhd"
+    monkeypatch.setattr(historico, "HISTORICO_PATH", salida)
+    monkeypatch.setattr(historico, "_almacen", None)
+    assert obtener_almacen() is None
+
+    importar_csv([_csv(tmp_path, CABECERA + FILAS[0] + "\n", "a.csv")], salida)
+    primero = obtener_almacen()
+    assert primero.elecciones() == [("Generales", 2023, 37)]
+    # Sin cambios en el fichero se reutiliza el mismo mapa
+    assert obtener_almacen() is primero
+
+    importar_csv([_csv(tmp_path, CABECERA + FILAS[5] + "\n", "b.csv")], salida)
+    segundo = obtener_almacen()
+    assert segundo is not primero
+    assert segundo.firma != primero.firma
+    assert segundo.elecciones() == [("Generales", 2019, 37)]
+    # El mapa anterior sigue siendo válido para quien lo estuviera usando
+    assert primero.elecciones() == [("Generales", 2023, 37)]
+    assert not (tmp_path / "historico.dhd.tmp").exists()
@@ -0,0 +1,140 @@
+# backend/test_trabajos.py
+#
+# Pruebas del gestor de trabajos en segundo plano sobre una BD temporal
+# (DHONDT_DB_PATH apunta a un fichero del directorio de la prueba).
+# Las funciones de trabajo están a nivel de módulo porque los trabajos
+# pesados se envían con pickle a un proceso hijo.
+
+import time
+
+import pytest
+from pydantic import BaseModel
+
+import db
+from trabajos import CANCELADO, COMPLETADO, EN_CURSO, PENDIENTE, GestorTrabajos
+
+
+class ParametrosEspera(BaseModel):
+    pasos: int = 1
+    pausa: float = 0.0
+
+
+def trabajo_espera(parametros, contexto):
+    """Trabajo de prueba: da `pasos` pasos de `pausa` segundos informando del progreso."""
+    for i in range(parametros.pasos):
+        time.sleep(parametros.pausa)
+        contexto.progreso(i + 1, parametros.pasos)
+    return {"pasos": parametros.pasos}
+
+
+@pytest.fixture
+def bd_temporal(tmp_path, monkeypatch):
+    ruta = tmp_path / "trabajos.sqlite3"
+    monkeypatch.setenv("DHONDT_DB_PATH", str(ruta))
+    monkeypatch.setattr(db, "DB_PATH", ruta)
+    db.init_db()
+    return ruta
+
+
+@pytest.fixture
+def crear_gestor(bd_temporal):
+    gestores = []
+
+    def crear(pesado=True, **opciones):
+        gestor = GestorTrabajos(**opciones)
+        gestor.registrar("espera", ParametrosEspera, trabajo_espera, pesado=pesado)
+        gestores.append(gestor)
+        return gestor
+
+    yield crear
+    for gestor in gestores:
+        gestor.detener()
+
+
+def _esperar_estado(gestor, trabajo_id, estado, limite=30.0):
+    fin = time.monotonic() + limite
+    while time.monotonic() < fin:
+        trabajo = gestor.obtener(trabajo_id)
+        if trabajo["estado"] == estado:
+            return trabajo
+        time.sleep(0.05)
+    raise AssertionError(f"El trabajo {trabajo_id} sigue en {gestor.obtener(trabajo_id)['estado']}, no en {estado}")
+
+
+@pytest.mark.parametrize("pesado", [False, True])
+def test_trabajo_pendiente_termina_completado(crear_gestor, pesado):
+    gestor = crear_gestor(pesado=pesado)
+    trabajo_id = gestor.encolar("espera", {"pasos": 3}, usuario_id=1)
+    assert gestor.obtener(trabajo_id)["estado"] == PENDIENTE
+
+    gestor.iniciar()
+    trabajo = _esperar_estado(gestor, trabajo_id, COMPLETADO)
+    assert trabajo["progreso"] == 1
+    assert trabajo["resultado_json"] == '{"pasos": 3}'
+
+
+def test_encolar_rechaza_parametros_no_validos(crear_gestor):
+    gestor = crear_gestor()
+    with pytest.raises(ValueError):
+        gestor.encolar("espera", {"pasos": "muchos"})
+    with pytest.raises(ValueError):
+        gestor.encolar("desconocido", {})
+
+
+@pytest.mark.parametrize("pesado", [False, True])
+def test_cancelar_trabajo_en_curso(crear_gestor, pesado):
+    gestor = crear_gestor(pesado=pesado)
+    gestor.iniciar()
+    trabajo_id = gestor.encolar("espera", {"pasos": 1000, "pausa": 0.05})
+    _esperar_estado(gestor, trabajo_id, EN_CURSO)
+
+    assert gestor.cancelar(trabajo_id)
+    _esperar_estado(gestor, trabajo_id, CANCELADO)
+    # Un trabajo ya terminado no se puede volver a cancelar
+    assert not gestor.cancelar(trabajo_id)
+
+
+def test_cancelar_trabajo_pendiente(crear_gestor):
+    gestor = crear_gestor()
+    trabajo_id = gestor.encolar("espera", {})
+    assert gestor.cancelar(trabajo_id)
+    assert gestor.obtener(trabajo_id)["estado"] == CANCELADO
+
+
+def test_detener_devuelve_el_trabajo_a_pendiente(crear_gestor):
+    gestor = crear_gestor()
+    gestor.iniciar()
+    trabajo_id = gestor.encolar("espera", {"pasos": 1000, "pausa": 0.05})
+    _esperar_estado(gestor, trabajo_id, EN_CURSO)
+
+    gestor.detener()
+    trabajo = gestor.obtener(trabajo_id)
+    assert trabajo["estado"] == PENDIENTE
+    assert trabajo["propietario"] is None
+    assert trabajo["progreso"] == 0
+
+
+def test_limite_de_pesados_entre_dos_gestores(crear_gestor):
+    gestores = [crear_gestor(num_trabajadores=2, max_pesados=1) for _ in range(2)]
+    ids = [gestores[0].encolar("espera", {"pasos": 4, "pausa": 0.05}) for _ in range(4)]
+    for gestor in gestores:
+        gestor.iniciar()
+
+    conn = db.get_connection()
+    try:
+        maximo = 0
+        fin = time.monotonic() + 60
+        while time.monotonic() < fin:
+            estados = [gestores[0].obtener(i)["estado"] for i in ids]
+            en_curso = conn.execute(
+                "SELECT COUNT(*) FROM trabajos WHERE estado = ? AND pesado = 1", (EN_CURSO,)
+            ).fetchone()[0]
+            maximo = max(maximo, en_curso)
+            if all(estado == COMPLETADO for estado in estados):
+                break
+            time.sleep(0.01)
+    finally:
+        conn.close()
+
+    assert all(gestores[0].obtener(i)["estado"] == COMPLETADO for i in ids)
+    assert maximo == 1
@@ -0,0 +1,147 @@
+# backend/test_transferencias.py
+#
+# Compara transferencia_minima con una búsqueda exhaustiva sobre casos pequeños:
+# se prueban todos los repartos finales de votos posibles (mismo total, solo bajan
+# los donantes y solo suben los receptores) y se busca el de menor movimiento.
+
+import itertools
+import random
+import time
+
+import pytest
+
+from dhondt import dhondt
+from transferencias import MAXIMO, MINIMO, aplicar_plan, transferencia_minima
+
+
+def _escanos(votos, num_escanos, partido, votos_minimos):
+    filtrados = {n: v for n, v in votos.items() if v >= votos_minimos}
+    if not filtrados:
+        return None
+    return dhondt(filtrados, num_escanos).get(partido, 0)
+
+
+def _cumple(escanos, escanos_objetivo, tipo):
+    if escanos is None:
+        return False
+    return escanos >= escanos_objetivo if tipo == MINIMO else escanos <= escanos_objetivo
+
+
+def _fuerza_bruta(votos, num_escanos, partido, escanos_objetivo, votos_minimos,
+                  donantes, receptores, tipo):
+    """Mínimo movimiento de votos entre todos los repartos finales permitidos."""
+    nombres = list(votos)
+    total = sum(votos.values())
+    rangos = []
+    for n in nombres:
+        minimo = 0 if donantes is None or n in donantes else votos[n]
+        maximo = total if receptores is None or n in receptores else votos[n]
+        rangos.append(range(minimo, maximo + 1))
+
+    mejor = None
+    for combinacion in itertools.product(*rangos[:-1]):
+        ultimo = total - sum(combinacion)
+        if ultimo not in rangos[-1]:
+            continue
+        finales = dict(zip(nombres, combinacion + (ultimo,)))
+        movidos = sum(max(0, votos[n] - finales[n]) for n in nombres)
+        if mejor is not None and movidos >= mejor:
+            continue
+        if _cumple(_escanos(finales, num_escanos, partido, votos_minimos), escanos_objetivo, tipo):
+            mejor = movidos
+    return mejor
+
+
+def _casos(semilla, cantidad):
+    rng = random.Random(semilla)
+    for _ in range(cantidad):
+        nombres = list("ABCD")[:rng.randint(2, 3)]
+        votos = {n: rng.randint(1, 9) for n in nombres}
+        num_escanos = rng.randint(1, 5)
+        votos_minimos = rng.choice([0, 0, rng.randint(1, 6)])
+        partido = rng.choice(nombres)
+        # Igual que en /calcular: al menos un partido debe superar la barrera
+        if max(votos.values()) < votos_minimos:
+            continue
+        yield rng, votos, num_escanos, partido, votos_minimos
+
+
+def _restriccion(rng, votos, partido, incluir_objetivo=True):
+    """Sin restricción, o un subconjunto aleatorio de los demás partidos (más el objetivo)."""
+    if rng.random() < 0.5:
+        return None
+    otros = [n for n in votos if n != partido and rng.random() < 0.5]
+    return [partido] + otros if incluir_objetivo else otros
+
+
+@pytest.mark.parametrize("semilla", range(5))
+def test_minimo_coincide_con_fuerza_bruta(semilla):
+    for rng, votos, num_escanos, partido, votos_minimos in _casos(semilla, 150):
+        escanos_objetivo = rng.randint(1, num_escanos)
+        donantes = _restriccion(rng, votos, partido)
+        receptores = _restriccion(rng, votos, partido)
+        esperado = _fuerza_bruta(votos, num_escanos, partido, escanos_objetivo,
+                                 votos_minimos, donantes, receptores, MINIMO)
+
+        plan = transferencia_minima(votos, num_escanos, partido, escanos_objetivo,
+                                    votos_minimos, donantes=donantes, receptores=receptores)
+
+        caso = (votos, num_escanos, partido, escanos_objetivo, votos_minimos, donantes, receptores)
+        if esperado is None:
+            assert plan is None, caso
+            continue
+        assert plan is not None, caso
+        assert sum(v for _, _, v in plan) == esperado, caso
+        nuevos = aplicar_plan(votos, plan)
+        assert _escanos(nuevos, num_escanos, partido, votos_minimos) >= escanos_objetivo, caso
+
+
+@pytest.mark.parametrize("semilla", range(5))
+def test_maximo_coincide_con_fuerza_bruta(semilla):
+    for rng, votos, num_escanos, partido, votos_minimos in _casos(100 + semilla, 150):
+        escanos_objetivo = rng.randint(0, num_escanos - 1)
+        donantes = _restriccion(rng, votos, partido)
+        receptores = _restriccion(rng, votos, partido, incluir_objetivo=False)
+        esperado = _fuerza_bruta(votos, num_escanos, partido, escanos_objetivo,
+                                 votos_minimos, donantes, receptores, MAXIMO)
+
+        plan = transferencia_minima(votos, num_escanos, partido, escanos_objetivo, votos_minimos,
+                                    donantes=donantes, receptores=receptores, tipo=MAXIMO)
+
+        caso = (votos, num_escanos, partido, escanos_objetivo, votos_minimos, donantes, receptores)
+        if esperado is None:
+            assert plan is None, caso
+            continue
+        assert plan is not None, caso
+        assert sum(v for _, _, v in plan) == esperado, caso
+        nuevos = aplicar_plan(votos, plan)
+        assert _escanos(nuevos, num_escanos, partido, votos_minimos) <= escanos_objetivo, caso
+
+
+def test_restricciones_incompatibles():
+    votos = {"A": 10, "B": 5, "C": 3}
+    with pytest.raises(ValueError):
+        transferencia_minima(votos, 3, "B", 2, receptores=["C"])
+    with pytest.raises(ValueError):
+        transferencia_minima(votos, 3, "A", 1, donantes=["B"], tipo=MAXIMO)
+
+
+@pytest.mark.parametrize("escanos_objetivo", [0, 100, 175])
+def test_maximo_congreso_es_rapido(escanos_objetivo):
+    # Caso realista: 350 escaños, 16 partidos y uno con 30M de votos (214 escaños)
+    rng = random.Random(7)
+    votos = {"A": 30_000_000}
+    for i in range(15):
+        votos[f"P{i}"] = rng.randint(200_000, 3_000_000)
+    votos_minimos = sum(votos.values()) * 3 // 100
+    assert dhondt(votos, 350)["A"] == 214
+
+    inicio = time.perf_counter()
+    plan = transferencia_minima(votos, 350, "A", escanos_objetivo, votos_minimos, tipo=MAXIMO)
+    transcurrido = time.perf_counter() - inicio
+
+    assert plan is not None
+    nuevos = aplicar_plan(votos, plan)
+    assert _escanos(nuevos, 350, "A", votos_minimos) <= escanos_objetivo
+    # Antes tardaba entre 7 y 14 segundos; ahora menos de medio segundo
+    assert transcurrido < 3, transcurrido
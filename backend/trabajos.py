@@ -0,0 +1,497 @@
+# backend/trabajos.py
+#
+# Trabajos en segundo plano (barridos, lotes, recálculos masivos...).
+# Los trabajos se guardan en la tabla `trabajos` de SQLite. Un pequeño grupo
+# de hilos del servidor los reclama, renueva su latido y guarda su progreso;
+# los trabajos pesados (CPU) se ejecutan en un ProcessPoolExecutor propio del
+# gestor, para que no compitan por el GIL con peticiones como /calcular.
+#
+# La BD es la única fuente de verdad, así que funciona también con varios
+# workers de uvicorn: cada proceso reclama trabajos con una transacción
+# BEGIN IMMEDIATE (solo un proceso a la vez), el límite de trabajos pesados
+# se cuenta en la tabla, la cancelación se pide con una marca en la fila y
+# cada proceso firma sus trabajos (propietario) y los mantiene vivos con un
+# latido. Si un proceso muere, otro recupera sus trabajos cuando el latido caduca.
+
+import json
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as TiempoAgotado
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import db
+from db import get_connection
+
+# Estados posibles de un trabajo
+PENDIENTE = "pendiente"
+EN_CURSO = "en_curso"
+COMPLETADO = "completado"
+FALLIDO = "fallido"
+CANCELADO = "cancelado"
+
+# Hilos que reclaman trabajos en cada proceso y máximo de trabajos pesados (CPU)
+# a la vez en todo el servidor. Los pesados van a procesos hijos, así que este
+# límite es el número de núcleos que pueden ocupar los trabajos.
+NUM_TRABAJADORES = 2
+MAX_TRABAJOS_PESADOS = 1
+
+# Cada cuánto (segundos) se guarda el progreso y se mira si hay que cancelar
+INTERVALO_PROGRESO = 0.5
+# Cada cuánto (segundos) miran la BD los hilos sin trabajo
+INTERVALO_SONDEO = 1.0
+# Cada cuánto (segundos) renueva un proceso el latido de sus trabajos
+INTERVALO_LATIDO = 5.0
+# Segundos sin latido tras los que un trabajo en curso se da por huérfano
+LATIDO_CADUCADO = 30
+
+
+class TrabajoCancelado(Exception):
+    """Se lanza dentro de un trabajo cuando hay que pararlo."""
+
+
+class ContextoTrabajo:
+    """
+    Objeto que recibe cada función de trabajo para informar del progreso
+    y comprobar si la han cancelado.
+    """
+
+    def __init__(self, gestor, trabajo_id):
+        self._gestor = gestor
+        self.trabajo_id = trabajo_id
+        self.cancelado_por_usuario = False
+        self._ultima_consulta = 0.0
+        self._ultimo_guardado = 0.0
+
+    def cancelado(self):
+        """
+        Indica si hay que parar: el usuario ha pedido cancelar (marca en la BD,
+        consultada como mucho cada INTERVALO_PROGRESO) o el servidor se apaga.
+        """
+        if not self.cancelado_por_usuario:
+            ahora = time.monotonic()
+            if ahora - self._ultima_consulta >= INTERVALO_PROGRESO:
+                self._ultima_consulta = ahora
+                fila = _consultar("SELECT cancelar FROM trabajos WHERE id = ?", (self.trabajo_id,))
+                self.cancelado_por_usuario = fila is None or bool(fila["cancelar"])
+        return self.cancelado_por_usuario or self._gestor._parando()
+
+    def progreso(self, hechos, total):
+        """
+        Guarda el progreso (hechos / total) y lanza TrabajoCancelado si toca parar.
+        Se puede llamar en cada paso: solo escribe en la BD cada INTERVALO_PROGRESO.
+        """
+        if self.cancelado():
+            raise TrabajoCancelado()
+        self.guardar_progreso(hechos / total if total else 1.0, forzar=hechos >= total)
+
+    def guardar_progreso(self, fraccion, forzar=False):
+        """Escribe la fracción completada en la BD (como mucho cada INTERVALO_PROGRESO)."""
+        ahora = time.monotonic()
+        if forzar or ahora - self._ultimo_guardado >= INTERVALO_PROGRESO:
+            self._ultimo_guardado = ahora
+            _ejecutar(
+                "UPDATE trabajos SET progreso = ? WHERE id = ? AND propietario = ?",
+                (min(1.0, fraccion), self.trabajo_id, self._gestor.propietario),
+            )
+
+
+class _ContextoProceso:
+    """
+    Contexto de un trabajo pesado dentro de un proceso hijo. No toca la BD:
+    deja el progreso y lee la cancelación en diccionarios compartidos con el
+    hilo del servidor que vigila el trabajo.
+    """
+
+    def __init__(self, trabajo_id, progresos, cancelaciones):
+        self.trabajo_id = trabajo_id
+        self._progresos = progresos
+        self._cancelaciones = cancelaciones
+        self._cancelado = False
+        self._ultimo_aviso = 0.0
+
+    def cancelado(self):
+        return self._cancelado
+
+    def progreso(self, hechos, total):
+        ahora = time.monotonic()
+        if ahora - self._ultimo_aviso >= INTERVALO_PROGRESO / 2 or hechos >= total:
+            self._ultimo_aviso = ahora
+            self._progresos[self.trabajo_id] = hechos / total if total else 1.0
+            self._cancelado = bool(self._cancelaciones.get(self.trabajo_id))
+        if self._cancelado:
+            raise TrabajoCancelado()
+
+
+def _iniciar_proceso(ruta_bd):
+    """
+    Prepara cada proceso hijo: usa la misma BD que el servidor y baja su
+    prioridad, para que en máquinas con pocos núcleos el sistema operativo
+    atienda antes a los procesos que sirven peticiones.
+    """
+    db.DB_PATH = Path(ruta_bd)
+    if hasattr(os, "nice"):
+        os.nice(10)
+
+
+def _ejecutar_en_proceso(funcion, parametros, trabajo_id, progresos, cancelaciones):
+    """Ejecuta un trabajo pesado dentro de un proceso hijo."""
+    return funcion(parametros, _ContextoProceso(trabajo_id, progresos, cancelaciones))
+
+
+def _ejecutar(sql, params=()):
+    """Ejecuta una sentencia de escritura y devuelve el número de filas afectadas."""
+    conn = get_connection()
+    try:
+        cur = conn.execute(sql, params)
+        conn.commit()
+        return cur.rowcount
+    finally:
+        conn.close()
+
+
+def _consultar(sql, params=()):
+    """Ejecuta una consulta y devuelve la primera fila como diccionario (o None)."""
+    conn = get_connection()
+    try:
+        fila = conn.execute(sql, params).fetchone()
+        return dict(fila) if fila is not None else None
+    finally:
+        conn.close()
+
+
+class GestorTrabajos:
+    """
+    Cola de trabajos con prioridades, cancelación y límite de trabajos pesados.
+
+    Los tipos de trabajo se registran con registrar(); cada tipo tiene un
+    modelo Pydantic para validar los parámetros y una función
+    funcion(parametros, contexto) que devuelve un resultado serializable a JSON.
+    Las funciones de los trabajos pesados se ejecutan en otro proceso, así que
+    deben estar definidas a nivel de módulo (se envían con pickle).
+    """
+
+    def __init__(self, num_trabajadores=NUM_TRABAJADORES, max_pesados=MAX_TRABAJOS_PESADOS):
+        self.num_trabajadores = num_trabajadores
+        self.max_pesados = max_pesados
+        # Identifica a este proceso como propietario de los trabajos que ejecuta
+        self.propietario = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._tipos = {}
+        self._condicion = threading.Condition()
+        self._hilos = []
+        self._parar = False
+
+        # Procesos para los trabajos pesados (se crean al iniciar)
+        self._cerrojo_procesos = threading.Lock()
+        self._procesos = None
+        self._compartido = None
+        self._progresos = None
+        self._cancelaciones = None
+
+    # -----------------------------
+    # Registro de tipos
+    # -----------------------------
+    def registrar(self, tipo, modelo, funcion, pesado=True):
+        """Da de alta un tipo de trabajo (los pesados se ejecutan en un proceso hijo)."""
+        self._tipos[tipo] = (modelo, funcion, pesado)
+
+    def validar(self, tipo, parametros):
+        """Comprueba tipo y parámetros. Lanza ValueError si algo no es correcto."""
+        if tipo not in self._tipos:
+            raise ValueError(f"Tipo de trabajo desconocido: {tipo}")
+        modelo, _, _ = self._tipos[tipo]
+        try:
+            return modelo(**parametros)
+        except Exception as e:
+            raise ValueError(f"Parámetros no válidos para el trabajo {tipo}: {e}")
+
+    # -----------------------------
+    # Arranque y parada
+    # -----------------------------
+    def iniciar(self):
+        """
+        Arranca los hilos trabajadores y el latido. Los trabajos pendientes se
+        recogen de la BD; los que quedaron en curso en un proceso que ya no existe
+        se reencolan cuando su latido caduca.
+        """
+        with self._condicion:
+            self._parar = False
+
+        if any(pesado for _, _, pesado in self._tipos.values()):
+            contexto = multiprocessing.get_context("spawn")
+            self._compartido = contexto.Manager()
+            self._progresos = self._compartido.dict()
+            self._cancelaciones = self._compartido.dict()
+            self._crear_procesos()
+
+        objetivos = [self._bucle] * self.num_trabajadores + [self._latir]
+        for i, objetivo in enumerate(objetivos):
+            hilo = threading.Thread(target=objetivo, name=f"trabajos-{i}", daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+
+    def detener(self):
+        """Pide a los hilos que terminen (los trabajos en curso vuelven a quedar pendientes)."""
+        with self._condicion:
+            self._parar = True
+            self._condicion.notify_all()
+        for hilo in self._hilos:
+            hilo.join(timeout=5)
+        self._hilos = []
+
+        # Si un trabajo no ha llegado a parar, su fila sigue en curso y otro
+        # proceso la recuperará cuando caduque el latido
+        with self._cerrojo_procesos:
+            if self._procesos is not None:
+                self._procesos.shutdown(wait=False, cancel_futures=True)
+                self._procesos = None
+        if self._compartido is not None:
+            self._compartido.shutdown()
+            self._compartido = None
+
+    # -----------------------------
+    # API pública
+    # -----------------------------
+    def encolar(self, tipo, parametros, prioridad=0, usuario_id=None):
+        """Valida, guarda el trabajo como pendiente y devuelve su id."""
+        self.validar(tipo, parametros)
+        _, _, pesado = self._tipos[tipo]
+
+        conn = get_connection()
+        try:
+            cur = conn.execute(
+                """
+                INSERT INTO trabajos (tipo, estado, prioridad, pesado, usuario_id, parametros_json)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (tipo, PENDIENTE, prioridad, int(pesado), usuario_id,
+                 json.dumps(parametros, ensure_ascii=False)),
+            )
+            conn.commit()
+            trabajo_id = cur.lastrowid
+        finally:
+            conn.close()
+
+        # Despierto a los hilos de este proceso (los demás lo verán al sondear)
+        with self._condicion:
+            self._condicion.notify_all()
+
+        return trabajo_id
+
+    def cancelar(self, trabajo_id):
+        """
+        Cancela un trabajo. Si está pendiente se marca como cancelado al momento;
+        si está en curso (en cualquier proceso), se parará en su siguiente paso.
+        Devuelve False si el trabajo no existe o ya había terminado.
+        """
+        filas = _ejecutar(
+            "UPDATE trabajos SET estado = ?, fecha_fin = CURRENT_TIMESTAMP WHERE id = ? AND estado = ?",
+            (CANCELADO, trabajo_id, PENDIENTE),
+        )
+        if filas:
+            return True
+
+        filas = _ejecutar(
+            "UPDATE trabajos SET cancelar = 1 WHERE id = ? AND estado = ?",
+            (trabajo_id, EN_CURSO),
+        )
+        return filas > 0
+
+    def obtener(self, trabajo_id):
+        """Devuelve la fila del trabajo como diccionario (o None si no existe)."""
+        return _consultar("SELECT * FROM trabajos WHERE id = ?", (trabajo_id,))
+
+    # -----------------------------
+    # Ejecución interna
+    # -----------------------------
+    def _parando(self):
+        with self._condicion:
+            return self._parar
+
+    def _esperar(self, segundos):
+        """Espera hasta `segundos` o hasta que haya novedades. Devuelve False si hay que parar."""
+        with self._condicion:
+            if not self._parar:
+                self._condicion.wait(timeout=segundos)
+            return not self._parar
+
+    def _reclamar(self):
+        """
+        Reclama en la BD el trabajo pendiente de más prioridad que se pueda ejecutar
+        ya (los pesados esperan si ya hay MAX_TRABAJOS_PESADOS en curso en cualquier
+        proceso). BEGIN IMMEDIATE garantiza que dos procesos no reclamen el mismo.
+        Devuelve (id, tipo) o None.
+        """
+        conn = get_connection()
+        conn.isolation_level = None
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+
+            # Trabajos de procesos que han dejado de latir: se reencolan (o se
+            # cancelan, si alguien lo había pedido)
+            caducado = f"-{LATIDO_CADUCADO} seconds"
+            conn.execute(
+                """
+                UPDATE trabajos SET estado = ?, fecha_fin = CURRENT_TIMESTAMP
+                WHERE estado = ? AND cancelar = 1 AND latido < datetime('now', ?)
+                """,
+                (CANCELADO, EN_CURSO, caducado),
+            )
+            conn.execute(
+                """
+                UPDATE trabajos
+                SET estado = ?, progreso = 0, fecha_inicio = NULL, propietario = NULL, latido = NULL
+                WHERE estado = ? AND latido < datetime('now', ?)
+                """,
+                (PENDIENTE, EN_CURSO, caducado),
+            )
+
+            pesados = conn.execute(
+                "SELECT COUNT(*) FROM trabajos WHERE estado = ? AND pesado = 1",
+                (EN_CURSO,),
+            ).fetchone()[0]
+
+            tipos = list(self._tipos)
+            marcas = ", ".join("?" * len(tipos))
+            fila = conn.execute(
+                f"""
+                SELECT id, tipo FROM trabajos
+                WHERE estado = ? AND tipo IN ({marcas}) AND (pesado = 0 OR ?)
+                ORDER BY prioridad DESC, id
+                LIMIT 1
+                """,
+                (PENDIENTE, *tipos, int(pesados < self.max_pesados)),
+            ).fetchone()
+
+            if fila is not None:
+                conn.execute(
+                    """
+                    UPDATE trabajos
+                    SET estado = ?, propietario = ?, fecha_inicio = CURRENT_TIMESTAMP,
+                        latido = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                    """,
+                    (EN_CURSO, self.propietario, fila["id"]),
+                )
+            conn.execute("COMMIT")
+            return (fila["id"], fila["tipo"]) if fila is not None else None
+        except Exception:
+            # BD ocupada o similar: lo intento en el siguiente sondeo
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            return None
+        finally:
+            conn.close()
+
+    def _bucle(self):
+        while not self._parando():
+            trabajo = self._reclamar() if self._tipos else None
+            if trabajo is None:
+                self._esperar(INTERVALO_SONDEO)
+                continue
+            self._ejecutar_trabajo(*trabajo)
+            # Al terminar un trabajo puede haber hueco para un pesado que esperaba
+            with self._condicion:
+                self._condicion.notify_all()
+
+    def _latir(self):
+        """Renueva el latido de los trabajos en curso de este proceso."""
+        while self._esperar(INTERVALO_LATIDO):
+            try:
+                _ejecutar(
+                    "UPDATE trabajos SET latido = CURRENT_TIMESTAMP WHERE propietario = ? AND estado = ?",
+                    (self.propietario, EN_CURSO),
+                )
+            except Exception:
+                pass
+
+    def _finalizar(self, trabajo_id, estado, resultado_json=None, error=None):
+        """Guarda el estado final, solo si el trabajo sigue siendo de este proceso."""
+        if estado == PENDIENTE:
+            # El servidor se apaga: el trabajo vuelve a la cola para otro proceso o el próximo arranque
+            sql = """
+                UPDATE trabajos
+                SET estado = ?, progreso = 0, fecha_inicio = NULL, propietario = NULL, latido = NULL
+                WHERE id = ? AND propietario = ?
+            """
+            params = (PENDIENTE, trabajo_id, self.propietario)
+        else:
+            sql = """
+                UPDATE trabajos
+                SET estado = ?, resultado_json = ?, error = ?, fecha_fin = CURRENT_TIMESTAMP,
+                    progreso = CASE WHEN ? = ? THEN 1 ELSE progreso END
+                WHERE id = ? AND propietario = ?
+            """
+            params = (estado, resultado_json, error, estado, COMPLETADO, trabajo_id, self.propietario)
+        _ejecutar(sql, params)
+
+    def _crear_procesos(self):
+        with self._cerrojo_procesos:
+            self._procesos = ProcessPoolExecutor(
+                max_workers=max(1, self.max_pesados),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_iniciar_proceso,
+                initargs=(str(db.DB_PATH),),
+            )
+
+    def _ejecutar_pesado(self, trabajo_id, funcion, parametros, contexto):
+        """
+        Envía el trabajo a un proceso hijo y, mientras tanto, guarda su progreso
+        y le pasa la cancelación (del usuario o por apagado del servidor).
+        """
+        futuro = self._procesos.submit(
+            _ejecutar_en_proceso, funcion, parametros, trabajo_id,
+            self._progresos, self._cancelaciones,
+        )
+        try:
+            while True:
+                try:
+                    return futuro.result(timeout=INTERVALO_PROGRESO)
+                except TiempoAgotado:
+                    pass
+                fraccion = self._progresos.get(trabajo_id)
+                if fraccion is not None:
+                    contexto.guardar_progreso(fraccion)
+                if contexto.cancelado():
+                    self._cancelaciones[trabajo_id] = True
+        finally:
+            try:
+                self._progresos.pop(trabajo_id, None)
+                self._cancelaciones.pop(trabajo_id, None)
+            except Exception:
+                pass
+
+    def _ejecutar_trabajo(self, trabajo_id, tipo):
+        trabajo = self.obtener(trabajo_id)
+        contexto = ContextoTrabajo(self, trabajo_id)
+
+        try:
+            _, funcion, pesado = self._tipos[tipo]
+            parametros = self.validar(tipo, json.loads(trabajo["parametros_json"]))
+            if pesado:
+                resultado = self._ejecutar_pesado(trabajo_id, funcion, parametros, contexto)
+            else:
+                resultado = funcion(parametros, contexto)
+        except TrabajoCancelado:
+            self._finalizar(trabajo_id, CANCELADO if contexto.cancelado_por_usuario else PENDIENTE)
+            return
+        except BrokenProcessPool:
+            # El proceso hijo ha muerto (por ejemplo, sin memoria): preparo otros
+            self._finalizar(trabajo_id, FALLIDO, error="El proceso del trabajo terminó de forma inesperada")
+            if not self._parando():
+                self._crear_procesos()
+            return
+        except Exception as e:
+            self._finalizar(trabajo_id, FALLIDO, error=str(e) or e.__class__.__name__)
+            return
+
+        self._finalizar(
+            trabajo_id, COMPLETADO,
+            resultado_json=json.dumps(resultado, ensure_ascii=False, default=str),
+        )
@@ -0,0 +1,515 @@
+# backend/transferencias.py
+
+from math import gcd
+
+from dhondt import dhondt
+
+# Tipos de objetivo
+MINIMO = "minimo"   # el partido debe llegar AL MENOS a escanos_objetivo
+MAXIMO = "maximo"   # el partido debe quedarse COMO MUCHO en escanos_objetivo
+
+
+def _cocientes_por_encima(votos, num_escanos, votos_ref, divisor_ref, gana_empate):
+    """
+    Cuenta cuántos cocientes votos/d (d = 1..num_escanos) de un partido quedan
+    por delante del cociente de referencia votos_ref/divisor_ref.
+
+    Todo se hace con enteros (votos * divisor_ref frente a d * votos_ref) para no
+    depender de floats. Si gana_empate es True, los cocientes iguales también cuentan
+    como "por delante" (el partido aparece antes en la lista y el reparto D'Hondt
+    respeta ese orden).
+    """
+    if votos <= 0:
+        return 0
+    if gana_empate:
+        n = (votos * divisor_ref) // votos_ref
+    else:
+        n = (votos * divisor_ref - 1) // votos_ref
+    return min(num_escanos, n)
+
+
+def _votos_maximos(max_cocientes, votos_ref, divisor_ref, gana_empate):
+    """
+    Máximo número de votos que puede tener un partido para que, como mucho,
+    max_cocientes de sus cocientes queden por delante del cociente de referencia.
+    Es la inversa exacta de _cocientes_por_encima.
+    """
+    limite = (max_cocientes + 1) * votos_ref
+    if gana_empate:
+        return (limite - 1) // divisor_ref
+    return limite // divisor_ref
+
+
+def _votos_necesarios(min_cocientes, votos_ref, divisor_ref, gana_empate):
+    """
+    Mínimo número de votos que necesita un partido para que al menos
+    min_cocientes de sus cocientes queden por delante del cociente de referencia.
+    """
+    limite = min_cocientes * votos_ref
+    if not gana_empate:
+        limite += 1
+    return -(-limite // divisor_ref)
+
+
+def _opciones_por_partido(votos_por_partido, num_escanos, partido, votos_ref, divisor_ref,
+                          votos_minimos):
+    """
+    Devuelve [(nombre, votos, gana_empate, cocientes_actuales)] para los demás partidos,
+    respecto al cociente votos_ref/divisor_ref del partido objetivo.
+    """
+    orden = list(votos_por_partido.keys())
+    posicion_objetivo = orden.index(partido)
+    datos = []
+    for posicion, nombre in enumerate(orden):
+        if nombre == partido:
+            continue
+        votos = votos_por_partido[nombre]
+        gana_empate = posicion < posicion_objetivo
+        actuales = 0
+        if votos >= votos_minimos:
+            actuales = _cocientes_por_encima(votos, num_escanos, votos_ref, divisor_ref, gana_empate)
+        datos.append((nombre, votos, gana_empate, actuales))
+    return datos
+
+
+def _reparto_como_mucho(opciones_partidos, presupuesto):
+    """
+    Programación dinámica: elige una opción (cocientes, coste) por partido de modo
+    que la suma de cocientes no pase de `presupuesto`, con el mínimo coste total.
+    Devuelve (coste, {nombre: coste_elegido}); coste infinito si no hay solución.
+    """
+    # mejor[b] = (coste mínimo, elecciones) usando como mucho b cocientes
+    mejor = [(0, {})] * (presupuesto + 1)
+    for nombre, opciones in opciones_partidos:
+        nuevo = []
+        for b in range(presupuesto + 1):
+            candidato = (float("inf"), {})
+            for cocientes, coste in opciones:
+                if cocientes > b:
+                    continue
+                coste_previo, elecciones = mejor[b - cocientes]
+                if coste_previo + coste < candidato[0]:
+                    candidato = (coste_previo + coste, {**elecciones, nombre: coste})
+            nuevo.append(candidato)
+        mejor = nuevo
+    return mejor[presupuesto]
+
+
+def _desplazar(costes, cocientes, coste):
+    """
+    Lleva cada estado c de `costes` al estado min(n, c + cocientes) sumando `coste`,
+    donde n es el último estado (que acumula "n o más"). Devuelve una lista nueva.
+    """
+    n = len(costes) - 1
+    infinito = float("inf")
+    if cocientes == 0:
+        return [x + coste for x in costes]
+    if cocientes > n:
+        return [infinito] * n + [min(costes) + coste]
+    return ([infinito] * cocientes
+            + [x + coste for x in costes[:n - cocientes]]
+            + [min(costes[n - cocientes:]) + coste])
+
+
+def _reparto_al_menos(opciones_partidos, necesarios, bloque):
+    """
+    Programación dinámica: elige una opción (cocientes, coste) por partido de modo
+    que la suma de cocientes llegue al menos a `necesarios`, con el mínimo coste total.
+
+    La primera opción de cada partido es la de no recibir votos. Los cocientes que
+    falten se completan con bloques bloque = (cocientes, coste), que se pueden añadir
+    a cualquier partido que ya reciba votos.
+
+    Devuelve (coste, {nombre: (cocientes, coste)}) solo con los partidos que reciben
+    votos (los bloques van sumados a uno de ellos); coste infinito si no hay solución.
+    """
+    infinito = float("inf")
+    tam_bloque, coste_bloque = bloque
+
+    # alguno[c] = coste mínimo con c cocientes (el último estado acumula "necesarios o más")
+    # y al menos un partido recibiendo votos; si ninguno recibe, el estado es único
+    alguno = [infinito] * (necesarios + 1)
+    ninguno = 0
+    historial = []
+    for nombre, opciones in opciones_partidos:
+        historial.append((alguno, ninguno))
+        sin_votos = opciones[0][0]
+        nuevo = _desplazar(alguno, sin_votos, 0)
+        for cocientes, coste in opciones[1:]:
+            nuevo = list(map(min, nuevo, _desplazar(alguno, cocientes, coste)))
+            destino = min(necesarios, ninguno + cocientes)
+            if coste < nuevo[destino]:
+                nuevo[destino] = coste
+        alguno = nuevo
+        ninguno = min(necesarios, ninguno + sin_votos)
+
+    if ninguno >= necesarios:
+        return 0, {}
+
+    def bloques(c):
+        return -(-(necesarios - c) // tam_bloque)
+
+    mejor, estado = min(
+        (coste + bloques(c) * coste_bloque, c) for c, coste in enumerate(alguno)
+    )
+    if mejor == infinito:
+        return infinito, {}
+
+    # Reconstruyo las elecciones recorriendo los partidos hacia atrás
+    elecciones = {}
+    restantes = bloques(estado)
+    valor = alguno[estado]
+    activo = True
+    for (nombre, opciones), (anterior, ninguno_anterior) in zip(reversed(opciones_partidos),
+                                                                reversed(historial)):
+        if not activo:
+            break
+        for indice, (cocientes, coste) in enumerate(opciones):
+            if indice > 0 and min(necesarios, ninguno_anterior + cocientes) == estado and coste == valor:
+                elecciones[nombre] = (cocientes, coste)
+                activo = False
+                break
+            previos = [c for c in range(max(0, estado - cocientes), estado + 1)
+                       if min(necesarios, c + cocientes) == estado and anterior[c] + coste == valor]
+            if previos:
+                if indice > 0:
+                    elecciones[nombre] = (cocientes, coste)
+                estado, valor = previos[0], anterior[previos[0]]
+                break
+
+    if restantes > 0:
+        receptor = next(iter(elecciones))
+        cocientes, coste = elecciones[receptor]
+        elecciones[receptor] = (cocientes + restantes * tam_bloque, coste + restantes * coste_bloque)
+    return mejor, elecciones
+
+
+# ============================================================
+# OBJETIVO "MÍNIMO": el partido llega al menos a K escaños
+# ============================================================
+
+def _coste_alcanzar(votos_por_partido, num_escanos, partido, escanos_objetivo,
+                    votos_minimos, donantes, transferencia):
+    """
+    Dada una transferencia total al partido objetivo, calcula el mínimo número de
+    votos que hay que quitar a los donantes para que el partido llegue a
+    escanos_objetivo escaños.
+
+    El partido objetivo consigue K escaños si su K-ésimo cociente está entre los
+    num_escanos más altos, es decir, si como mucho num_escanos - K cocientes de los
+    demás partidos quedan por delante. Para cada donante solo miro los umbrales
+    exactos en los que pierde un cociente (y, si hay barrera, el umbral en el que
+    deja de superarla), y reparto ese "presupuesto" de cocientes con una pequeña
+    programación dinámica.
+
+    Devuelve (coste, {donante: votos_a_quitar}) o None si no es posible.
+    """
+    votos_objetivo = votos_por_partido[partido] + transferencia
+    if votos_objetivo <= 0 or votos_objetivo < votos_minimos:
+        return None
+
+    # Cocientes que aún pueden quedar por delante del K-ésimo cociente objetivo
+    presupuesto = num_escanos - escanos_objetivo
+
+    opciones_donantes = []
+    for nombre, votos, gana_empate, actuales in _opciones_por_partido(
+            votos_por_partido, num_escanos, partido, votos_objetivo, escanos_objetivo, votos_minimos):
+        if nombre not in donantes:
+            presupuesto -= actuales
+            continue
+
+        opciones = [(actuales, 0)]
+        for m in range(actuales):
+            coste = votos - _votos_maximos(m, votos_objetivo, escanos_objetivo, gana_empate)
+            opciones.append((m, coste))
+        # Quedarse por debajo de la barrera elimina todos sus cocientes de golpe
+        if votos_minimos > 0 and actuales > 0:
+            opciones.append((0, votos - votos_minimos + 1))
+        opciones_donantes.append((nombre, opciones))
+
+    if presupuesto < 0:
+        return None
+
+    coste, elecciones = _reparto_como_mucho(opciones_donantes, presupuesto)
+    if coste == float("inf"):
+        return None
+    return coste, elecciones
+
+
+def _plan_alcanzar(votos_por_partido, num_escanos, partido, escanos_objetivo,
+                   votos_minimos, donantes, transferencia):
+    """
+    Construye un plan [(donante, partido, votos)] que suma exactamente `transferencia`,
+    o None si con esa cantidad no se alcanza el objetivo.
+    """
+    disponibles = sum(votos_por_partido[d] for d in donantes)
+    if transferencia > disponibles:
+        return None
+
+    calculo = _coste_alcanzar(votos_por_partido, num_escanos, partido, escanos_objetivo,
+                              votos_minimos, donantes, transferencia)
+    if calculo is None or calculo[0] > transferencia:
+        return None
+
+    _, elecciones = calculo
+    plan = {d: elecciones.get(d, 0) for d in donantes}
+
+    # Los votos que sobran los saco de los donantes con más votos restantes
+    # (quitar votos a un rival nunca perjudica al partido objetivo)
+    sobrante = transferencia - sum(plan.values())
+    for d in sorted(donantes, key=lambda d: votos_por_partido[d] - plan[d], reverse=True):
+        if sobrante == 0:
+            break
+        extra = min(sobrante, votos_por_partido[d] - plan[d])
+        plan[d] += extra
+        sobrante -= extra
+
+    return [(d, partido, v) for d, v in plan.items()]
+
+
+# ============================================================
+# OBJETIVO "MÁXIMO": el partido se queda como mucho en K escaños
+# ============================================================
+
+def _coste_limitar(votos_por_partido, num_escanos, partido, escanos_objetivo,
+                   votos_minimos, receptores, transferencia):
+    """
+    Dada una transferencia total que sale del partido objetivo, calcula el mínimo
+    número de votos que hay que dar a los receptores para que el partido se quede
+    como mucho en escanos_objetivo escaños.
+
+    El partido tiene como mucho K escaños si su (K+1)-ésimo cociente queda fuera,
+    es decir, si al menos num_escanos - K cocientes de los demás partidos quedan
+    por delante. Para cada receptor solo miro los votos exactos en los que gana
+    un cociente (y el umbral de la barrera si no la supera).
+
+    Pasado el primer umbral, cada cociente extra cuesta casi lo mismo
+    (votos_objetivo / (K+1) redondeado), y cada L = (K+1) / mcd(votos_objetivo, K+1)
+    cocientes cuestan exactamente L * votos_objetivo / (K+1). Por eso basta con mirar
+    un periodo de L umbrales por receptor y completar con bloques de L cocientes.
+
+    Como esto se llama en cada paso de la búsqueda binaria, antes de la programación
+    dinámica exacta calculo una cota inferior y una solución válida con solo dos
+    opciones por receptor; casi siempre alguna de las dos decide ya la respuesta.
+
+    Devuelve (coste, {receptor: votos_a_dar}) con coste <= transferencia, o None si
+    con esa transferencia no es posible.
+    """
+    votos_objetivo = votos_por_partido[partido] - transferencia
+    if votos_objetivo < 0:
+        return None
+
+    # Si el partido queda por debajo de la barrera (o sin votos) ya no obtiene escaños;
+    # solo hace falta que algún otro partido la supere para que haya reparto.
+    if votos_objetivo < max(1, votos_minimos):
+        if any(v >= max(1, votos_minimos) for n, v in votos_por_partido.items() if n != partido):
+            return 0, {}
+        costes = [(max(1, votos_minimos) - votos_por_partido[r], r) for r in receptores]
+        if not costes:
+            return None
+        coste, receptor = min(costes)
+        return coste, {receptor: coste}
+
+    # Cocientes de los demás que tienen que quedar por delante del (K+1)-ésimo
+    divisor = escanos_objetivo + 1
+    datos = _opciones_por_partido(votos_por_partido, num_escanos, partido,
+                                  votos_objetivo, divisor, votos_minimos)
+    necesarios = num_escanos - escanos_objetivo - sum(
+        actuales for nombre, _, _, actuales in datos if nombre not in receptores
+    )
+    if necesarios <= 0:
+        return 0, {}
+
+    periodo = divisor // gcd(votos_objetivo, divisor)
+    coste_periodo = periodo * votos_objetivo // divisor
+
+    receptores_datos = [d for d in datos if d[0] in receptores]
+    if sum(actuales for _, _, _, actuales in receptores_datos) >= necesarios:
+        return 0, {}
+
+    def coste(votos, gana_empate, m):
+        """Votos que hay que dar al receptor para que tenga m cocientes por delante."""
+        objetivo_votos = max(votos_minimos, _votos_necesarios(m, votos_objetivo, divisor, gana_empate))
+        return max(0, objetivo_votos - votos)
+
+    # Primer número de cocientes que puede ganar cada receptor: uno más de los que
+    # tiene o, si no supera la barrera, los que consigue justo al superarla
+    primeros = {}
+    for nombre, votos, gana_empate, actuales in receptores_datos:
+        primero = actuales + 1
+        if votos < votos_minimos:
+            primero = max(1, _cocientes_por_encima(votos_minimos, num_escanos, votos_objetivo,
+                                                   divisor, gana_empate))
+        primeros[nombre] = primero
+
+    # Cota inferior y solución válida. Trabajo en unidades de votos * divisor: el
+    # coste de m cocientes es m * votos_objetivo más un resto que, dentro de un
+    # periodo, se mueve menos de un voto. Para cada receptor me quedo con el primer
+    # umbral y con el siguiente, este último con el menor resto de todo el periodo.
+    opciones_cota = []
+    for nombre, votos, gana_empate, actuales in receptores_datos:
+        primero = primeros[nombre]
+        restos = [divisor * coste(votos, gana_empate, m) - m * votos_objetivo
+                  for m in range(primero, primero + periodo + 1)]
+        opciones_cota.append((nombre, [
+            (actuales, 0),
+            (primero, primero * votos_objetivo + restos[0]),
+            (primero + 1, (primero + 1) * votos_objetivo + min(restos[1:])),
+        ]))
+    cota, elecciones_cota = _reparto_al_menos(opciones_cota, necesarios, (1, votos_objetivo))
+    if cota == float("inf") or -(-cota // divisor) > transferencia:
+        return None
+
+    # Con esos mismos cocientes, el coste real es una solución válida
+    votos_receptor = {nombre: (votos, gana_empate) for nombre, votos, gana_empate, _ in receptores_datos}
+    elecciones = {nombre: coste(*votos_receptor[nombre], m) for nombre, (m, _) in elecciones_cota.items()}
+    if sum(elecciones.values()) <= transferencia:
+        return sum(elecciones.values()), elecciones
+
+    # Si las cotas no deciden, programación dinámica exacta sobre un periodo por receptor
+    opciones_receptores = []
+    for nombre, votos, gana_empate, actuales in receptores_datos:
+        primero = primeros[nombre]
+        ultimo = min(primero + periodo, max(primero, necesarios))
+        opciones = [(actuales, 0)]
+        opciones += [(m, coste(votos, gana_empate, m)) for m in range(primero, ultimo + 1)]
+        opciones_receptores.append((nombre, opciones))
+
+    total, elecciones = _reparto_al_menos(opciones_receptores, necesarios, (periodo, coste_periodo))
+    if total > transferencia:
+        return None
+    return total, {nombre: votos for nombre, (_, votos) in elecciones.items()}
+
+
+def _plan_limitar(votos_por_partido, num_escanos, partido, escanos_objetivo,
+                  votos_minimos, receptores, transferencia):
+    """
+    Construye un plan [(partido, receptor, votos)] que suma exactamente
+    `transferencia`, o None si con esa cantidad no se consigue el objetivo.
+    """
+    if transferencia > votos_por_partido[partido] or (not receptores and transferencia > 0):
+        return None
+
+    calculo = _coste_limitar(votos_por_partido, num_escanos, partido, escanos_objetivo,
+                             votos_minimos, receptores, transferencia)
+    if calculo is None or calculo[0] > transferencia:
+        return None
+
+    _, elecciones = calculo
+    plan = {r: elecciones.get(r, 0) for r in receptores}
+
+    # Lo que sobra va al receptor con más votos (dar votos a un rival nunca le ayuda)
+    sobrante = transferencia - sum(plan.values())
+    if sobrante:
+        mayor = max(receptores, key=lambda r: votos_por_partido[r] + plan[r])
+        plan[mayor] += sobrante
+
+    return [(partido, r, v) for r, v in plan.items()]
+
+
+# ============================================================
+# BÚSQUEDA
+# ============================================================
+
+def aplicar_plan(votos_por_partido, plan):
+    """Devuelve un nuevo diccionario de votos tras aplicar [(origen, destino, votos)]."""
+    nuevos = dict(votos_por_partido)
+    for origen, destino, votos in plan:
+        nuevos[origen] -= votos
+        nuevos[destino] += votos
+    return nuevos
+
+
+def _escanos_tras_plan(votos_por_partido, num_escanos, partido, votos_minimos, plan):
+    """Reparto real con dhondt() tras aplicar el plan (None si nadie supera la barrera)."""
+    nuevos = aplicar_plan(votos_por_partido, plan)
+    filtrados = {n: v for n, v in nuevos.items() if v >= votos_minimos}
+    if not filtrados:
+        return None
+    return dhondt(filtrados, num_escanos).get(partido, 0)
+
+
+def transferencia_minima(votos_por_partido, num_escanos, partido, escanos_objetivo,
+                         votos_minimos=0, donantes=None, receptores=None, tipo=MINIMO):
+    """
+    Calcula la mínima transferencia de votos para que `partido` obtenga al menos
+    (tipo "minimo") o como mucho (tipo "maximo") `escanos_objetivo` escaños con
+    el método D'Hondt.
+
+    - "minimo": los votos salen de los donantes y van siempre al partido objetivo
+      (dárselos a otro partido solo subiría cocientes rivales). Si se indican
+      receptores, deben incluir al partido objetivo.
+    - "maximo": los votos salen siempre del partido objetivo y van a los receptores
+      (quitárselos a otro partido solo bajaría cocientes rivales). Si se indican
+      donantes, deben incluir al partido objetivo.
+
+    Como en /calcular, se supone que al menos un partido supera la barrera.
+
+    Parámetros:
+        votos_por_partido: diccionario {nombre_partido: votos} (en el orden de la tabla)
+        num_escanos: número total de escaños (int)
+        partido: partido objetivo
+        escanos_objetivo: escaños mínimos ("minimo") o máximos ("maximo")
+        votos_minimos: barrera en votos (0 si no hay umbral)
+        donantes: partidos de los que se pueden sacar votos (None = todos)
+        receptores: partidos que pueden recibir votos (None = todos)
+        tipo: "minimo" o "maximo"
+
+    Devuelve:
+        lista [(origen, destino, votos)] (solo movimientos con votos > 0), o None si
+        ni siquiera moviendo todos los votos permitidos se llega al objetivo.
+        Lanza ValueError si las restricciones no son compatibles con el objetivo.
+    """
+    otros = [p for p in votos_por_partido if p != partido]
+
+    if tipo == MINIMO:
+        if receptores is not None and partido not in receptores:
+            raise ValueError("Para conseguir escaños, el partido objetivo debe estar entre los receptores")
+        permitidos = otros if donantes is None else [p for p in otros if p in donantes]
+        construir = _plan_alcanzar
+        bajo = max(0, votos_minimos - votos_por_partido[partido])
+        alto = sum(votos_por_partido[d] for d in permitidos)
+
+        def cumple(escanos):
+            return escanos is not None and escanos >= escanos_objetivo
+    elif tipo == MAXIMO:
+        if donantes is not None and partido not in donantes:
+            raise ValueError("Para quitar escaños, el partido objetivo debe estar entre los donantes")
+        permitidos = otros if receptores is None else [p for p in otros if p in receptores]
+        construir = _plan_limitar
+        bajo = 0
+        alto = votos_por_partido[partido] if permitidos else 0
+
+        def cumple(escanos):
+            return escanos is not None and escanos <= escanos_objetivo
+    else:
+        raise ValueError(f"Tipo de objetivo desconocido: {tipo}")
+
+    def plan_para(transferencia):
+        return construir(votos_por_partido, num_escanos, partido, escanos_objetivo,
+                         votos_minimos, permitidos, transferencia)
+
+    # La condición es monótona: si con T votos se consigue, con T + 1 también
+    # (el voto extra sale de un rival hacia el objetivo, o del objetivo hacia un
+    # rival), así que hago una búsqueda binaria sobre la cantidad transferida.
+    total = alto
+    if plan_para(alto) is None:
+        return None
+
+    while bajo < alto:
+        medio = (bajo + alto) // 2
+        if plan_para(medio) is not None:
+            alto = medio
+        else:
+            bajo = medio + 1
+
+    # Compruebo el plan con el reparto real. Los cálculos son exactos con enteros,
+    # pero dhondt() compara floats y en empates muy ajustados podría diferir.
+    for transferencia in range(bajo, total + 1):
+        plan = plan_para(transferencia)
+        if plan is None:
+            continue
+        if cumple(_escanos_tras_plan(votos_por_partido, num_escanos, partido, votos_minimos, plan)):
+            return [(o, d, v) for o, d, v in plan if v > 0]
+
+    return None